@@ -0,0 +1,167 @@
+"""
+Batch analysis of Gobblet positions.
+
+Reads positions, in the text notation (see notation), one per line, and
+searches each one with MinimaxPlayer in a pool of worker processes, to
+a fixed depth or for a fixed time per position. Results come back in
+the order the positions were read, as soon as each one is ready, so a
+long file can be piped through without waiting for the end.
+
+Each worker keeps one player for all the positions it's given, so its
+transposition table carries over from one position to the next, which
+pays off when the positions come from the same games.
+
+    python -m analysis positions.txt --depth 3
+    python -m analysis positions.txt --time 0.5 --processes 4
+
+prints a line per position: the position, the best move, its score and
+the number of positions searched.
+
+Lines that are blank or start with "#" are skipped. Use "-" to read
+from stdin.
+"""
+import argparse
+from collections import deque, namedtuple
+from itertools import islice
+import multiprocessing
+import sys
+
+from gobblet import MinimaxPlayer, Move, Player
+import notation
+
+
+Analysis = namedtuple('Analysis', 'position move score nodes')
+
+
+def read_positions(path, variant=None):
+    """
+    Yield positions from a file, or stdin if path is "-". Given a variant,
+    the file holds binary records (see notation.to_bytes) rather than text.
+    """
+    if variant is not None:
+        size = notation.record_size(variant)
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(size)
+                if not data:
+                    return
+                yield notation.from_bytes(data, variant)
+
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield notation.from_text(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# The player each worker process searches with, made once per process.
+_player = None
+_settings = None
+
+
+def _init_worker(depth, time_limit, table_size):
+    global _player, _settings
+    _player = MinimaxPlayer('analysis', table_size=table_size)
+    _settings = depth, time_limit
+
+
+def _analyse(text):
+    depth, time_limit = _settings
+    position = notation.from_text(text)
+    game = position.to_game(Player('white'), Player('black'))
+    best, score, nodes, searched = _player.think(game, depth, time_limit)
+
+    move = None
+    if best is not None:
+        piece, dest = best
+        move = Move(piece.size.value, game.board.find(piece), dest)
+    return move, score, nodes
+
+
+def _analyse_batch(texts):
+    return [_analyse(text) for text in texts]
+
+
+def analyse(positions, depth=None, time_limit=None, processes=None,
+            chunksize=1, table_size=1000000, window=2):
+    """
+    Search each of the positions, an iterable of gobblet.Position, and
+    yield an Analysis for each one, in the same order.
+
+    processes defaults to the number of CPUs. With processes=0, the
+    positions are searched one by one in this process instead. Positions
+    go to the workers chunksize at a time, and only window chunks per
+    worker are read ahead of the results, so a long iterable is never
+    all in memory at once.
+    """
+    if depth is None and time_limit is None:
+        raise ValueError('Give a depth, a time limit or both')
+
+    args = depth, time_limit, table_size
+    if processes == 0:
+        _init_worker(*args)
+        for position in positions:
+            move, score, nodes = _analyse(notation.to_text(position))
+            yield Analysis(position, move, score, nodes)
+        return
+
+    processes = processes or multiprocessing.cpu_count()
+    positions = iter(positions)
+
+    # Positions go to the workers in the text notation, which is much
+    # smaller to send than a pickle. The originals wait here, in order,
+    # with the results they're waiting for.
+    pending = deque()
+
+    pool = multiprocessing.Pool(processes, _init_worker, args)
+    try:
+        while True:
+            while len(pending) < processes * window:
+                batch = list(islice(positions, chunksize))
+                if not batch:
+                    break
+                texts = [notation.to_text(position) for position in batch]
+                pending.append(
+                    (batch, pool.apply_async(_analyse_batch, (texts,))))
+
+            if not pending:
+                break
+            batch, result = pending.popleft()
+            for position, (move, score, nodes) in zip(batch, result.get()):
+                yield Analysis(position, move, score, nodes)
+    finally:
+        # Also stops the workers if the caller gives up on the results.
+        pool.terminate()
+        pool.join()
+
+
+def format_analysis(analysis):
+    move = '-'
+    if analysis.move is not None:
+        move = notation.move_to_text(analysis.move)
+    return '{}\t{}\t{}\t{}'.format(notation.to_text(analysis.position), move,
+                                   analysis.score, analysis.nodes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analyse Gobblet positions')
+    parser.add_argument('path', help='positions, one per line, or "-"')
+    parser.add_argument('--depth', type=int, default=None)
+    parser.add_argument('--time', type=float, default=None,
+                        help='seconds per position')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=1)
+
+    args = parser.parse_args()
+    if args.depth is None and args.time is None:
+        args.depth = 2
+
+    results = analyse(read_positions(args.path), args.depth, args.time,
+                      args.processes, args.chunksize)
+    for analysis in results:
+        print(format_analysis(analysis))
+        sys.stdout.flush()
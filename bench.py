@@ -0,0 +1,248 @@
+"""
+Benchmarks.
+
+The memory benchmark reports how many bytes the game's data structures
+take up: a Board, a Dugout, a Game, a stored Position (alone, and as one
+of a game's worth of positions sharing rows), a transposition table
+entry, and the peak memory used over a whole game and over a fixed depth
+search. Sizes are found by walking each object with sys.getsizeof(),
+leaving out what's shared between every game, such as players and piece
+sizes. Peaks are measured with tracemalloc where there is one (Python
+3.4 on). Without it, they're the most the game and the players'
+transposition tables take up at once, walked the same way after every
+move and at the end of the search, which leaves out anything the search
+only holds on to for a moment.
+
+    python -m bench memory
+    python -m bench memory --save baseline.json
+    python -m bench memory --baseline baseline.json --tolerance 0.1
+
+With a baseline, anything more than tolerance (a fraction) bigger than
+before is reported, and the command exits with status 1.
+"""
+import argparse
+import gc
+import json
+import random
+import sys
+import types
+
+from gobblet import (Dugout, Events, Game, MinimaxPlayer, Player, Position,
+                     Size, Variant, create_stacks)
+import notation
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+
+# Shared between every game, so not counted as part of any one of them.
+SHARED = (Size, Player, Variant, type, types.ModuleType, types.FunctionType,
+          types.MethodType)
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    The size of obj in bytes, with everything it refers to: the items of
+    containers and the attributes of objects, counting each object once.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, SHARED):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_sizeof(key, seen) + deep_sizeof(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_sizeof(item, seen)
+    elif isinstance(obj, (str, bytes, bytearray, int, float)):
+        pass
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deep_sizeof(obj.__dict__, seen)
+        for klass in type(obj).__mro__:
+            for name in getattr(klass, '__slots__', ()):
+                if hasattr(obj, name):
+                    size += deep_sizeof(getattr(obj, name), seen)
+    return size
+
+
+def peak_memory(function):
+    """
+    Call function, and return the most memory it had allocated at once,
+    in bytes, as measured by tracemalloc.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def held_peaks(search_depth=3):
+    """
+    Return the most the game and the players' transposition tables take
+    up at once over a game, and at the end of a search, by deep_sizeof().
+    For when there's no tracemalloc.
+    """
+    white = MinimaxPlayer('white', depth=1)
+    black = MinimaxPlayer('black', depth=1)
+    game = Game(white, black)
+    peak = [deep_sizeof([game, white.table, black.table])]
+
+    def record(event):
+        if event.kind == Events.move:
+            peak[0] = max(peak[0],
+                          deep_sizeof([game, white.table, black.table]))
+
+    game.add_observer(record)
+    game.play(200)
+
+    player = MinimaxPlayer('minimax')
+    searched = Game(player, Player('black'))
+    player.best_move(searched, search_depth)
+    return peak[0], deep_sizeof([searched, player.table])
+
+
+def midgame(plies=8, seed=0):
+    """A game between two players, played plies random moves in."""
+    game = Game(Player('white'), Player('black'))
+    rand = random.Random(seed)
+    for ply in range(plies):
+        moves = game.available_moves()
+        rand.shuffle(moves)
+        for piece, dest in moves:
+            token, winner = game._apply(piece, dest)
+            if winner is None:
+                break
+            game._undo(token)
+    return game
+
+
+def game_positions(max_turns=200):
+    """The positions of a whole game between two MinimaxPlayers."""
+    game = Game(MinimaxPlayer('white', depth=1),
+                MinimaxPlayer('black', depth=1))
+    positions = [Position.from_game(game)]
+
+    def record(event):
+        if event.kind == Events.move:
+            positions.append(positions[-1].play(event.move))
+
+    game.add_observer(record)
+    game.play(max_turns)
+    return positions
+
+
+def measure_memory(search_depth=3):
+    """Return a dict of {measurement: bytes}, and how peaks were measured."""
+    results = {}
+
+    game = midgame()
+    variant = game.variant
+    results['board'] = deep_sizeof(game.board)
+    results['dugout'] = deep_sizeof(Dugout(create_stacks(
+        game.white.player, variant.sizes, variant.num_stacks)))
+    results['game'] = deep_sizeof(game)
+
+    position = Position.from_game(game)
+    results['position'] = deep_sizeof(position)
+    results['position_text'] = len(notation.to_text(position))
+    results['position_binary'] = len(notation.to_bytes(position))
+
+    # Positions from one game share most of their rows with the one
+    # before, so they take up less than that much each.
+    positions = game_positions()
+    results['game_position'] = deep_sizeof(positions) // len(positions)
+
+    player = MinimaxPlayer('minimax')
+    searched = Game(player, Player('black'))
+    player.best_move(searched, search_depth)
+    results['table_entry'] = deep_sizeof(player.table) // len(player.table)
+
+    def play_game():
+        Game(MinimaxPlayer('white', depth=1),
+             MinimaxPlayer('black', depth=1)).play(200)
+
+    def search():
+        player = MinimaxPlayer('minimax')
+        player.best_move(Game(player, Player('black')), search_depth)
+
+    if tracemalloc is not None:
+        results['peak_game'] = peak_memory(play_game)
+        results['peak_search'] = peak_memory(search)
+        return results, 'tracemalloc'
+
+    results['peak_game'], results['peak_search'] = held_peaks(search_depth)
+    return results, 'deep_sizeof'
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Return the names of the measurements in results which are more than
+    tolerance (a fraction) bigger than in baseline.
+    """
+    worse = []
+    for name, size in sorted(results.items()):
+        before = baseline.get(name)
+        if before and size > before * (1 + tolerance):
+            worse.append(name)
+    return worse
+
+
+def _memory_command(args):
+    results, method = measure_memory(args.depth)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            saved = json.load(f)
+        baseline = saved['results']
+        # Peaks measured different ways can't be compared.
+        if saved.get('method') != method:
+            baseline = dict((name, size) for name, size in baseline.items()
+                            if not name.startswith('peak_'))
+
+    for name, size in sorted(results.items()):
+        line = '{:<16} {:>10}'.format(name, size)
+        if baseline and baseline.get(name):
+            line += ' {:>+8.1%}'.format(size / float(baseline[name]) - 1)
+        print(line)
+    print('(peaks measured with {})'.format(method))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'method': method, 'results': results}, f, indent=2,
+                      sort_keys=True)
+
+    if baseline:
+        worse = compare(results, baseline, args.tolerance)
+        if worse:
+            print('Bigger than the baseline: {}'.format(', '.join(worse)))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gobblet benchmarks')
+    commands = parser.add_subparsers(dest='command')
+
+    memory = commands.add_parser('memory', help='measure memory use')
+    memory.add_argument('--depth', type=int, default=3,
+                        help='depth of the search to measure')
+    memory.add_argument('--save', default=None,
+                        help='save the results as a baseline')
+    memory.add_argument('--baseline', default=None,
+                        help='compare against a saved baseline')
+    memory.add_argument('--tolerance', type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == 'memory':
+        sys.exit(_memory_command(args))
@@ -0,0 +1,217 @@
+"""
+Opening book for Gobblet.
+
+A book maps positions (by gobblet.position_hash(), which folds together
+the rotations and reflections of the board) to the move to play there.
+It's built ahead of time by searching every position reachable in the
+first few moves of a game, then saved as a file of fixed size records
+sorted by hash. OpeningBook memory-maps that file and finds positions
+with a binary search, so looking up a move reads a handful of records
+instead of loading the whole book.
+
+To build a book covering the first four moves, searching each
+position three moves deep:
+
+    python -m book build opening.book --plies 4 --depth 3
+"""
+import argparse
+import mmap
+import struct
+
+from gobblet import (Game, MinimaxPlayer, Player, board_symmetries,
+                     position_hash)
+
+
+MAGIC = b'GBK1'
+
+# Magic, board size, number of piece sizes, number of dugout stacks,
+# number of records.
+HEADER = struct.Struct('>4sBBBI')
+
+# Position hash, move source, move destination, score.
+# Big endian, so records sort by hash the same way as the bytes do.
+RECORD = struct.Struct('>QBBi')
+
+# Sources below this are board cells (row * board size + column),
+# sources above it are a piece of size (source - DUGOUT) from the dugout.
+DUGOUT = 0x80
+
+
+class BookError(Exception): pass
+
+
+def encode_move(board, piece, dest, symmetry):
+    """
+    Encode a move as (source, dest) bytes, with cells translated by
+    the symmetry, i.e. in the frame of the position that was hashed.
+    """
+    transform = board_symmetries(board.size)[symmetry]
+
+    source = board.find(piece)
+    if source is None:
+        source = DUGOUT + piece.size.value
+    else:
+        row, col = transform[source]
+        source = row * board.size + col
+
+    row, col = transform[tuple(dest)]
+    return source, row * board.size + col
+
+
+def decode_move(game, source, dest, symmetry):
+    """
+    Turn encoded (source, dest) bytes back into a (piece, dest) move
+    for the player on deck. Returns None if the move can't be played.
+    """
+    board = game.board
+    transform = board_symmetries(board.size)[symmetry]
+    inverse = dict((to, key) for key, to in transform.items())
+
+    dest = inverse[divmod(dest, board.size)]
+
+    if source >= DUGOUT:
+        for piece in game.on_deck.dugout.available:
+            if piece.size.value == source - DUGOUT:
+                return piece, dest
+        return None
+
+    cell = board[inverse[divmod(source, board.size)]]
+    if not cell or cell.top().player is not game.on_deck.player:
+        return None
+    return cell.top(), dest
+
+
+class OpeningBook(object):
+
+    """
+    Read-only view of a book file. Use as a context manager, or call
+    close() when done.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.board_size, self.num_sizes, self.num_stacks, \
+            self.count = HEADER.unpack_from(self._map, 0)
+
+        if magic != MAGIC:
+            self.close()
+            raise BookError('{} is not an opening book'.format(path))
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _record(self, i):
+        return RECORD.unpack_from(self._map, HEADER.size + i * RECORD.size)
+
+    def find(self, key):
+        """Return the (source, dest, score) recorded for a hash, or None."""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self._record(mid)
+            if record[0] < key:
+                lo = mid + 1
+            elif record[0] > key:
+                hi = mid
+            else:
+                return record[1:]
+
+    def move(self, game):
+        """Return the book move for the player on deck, or None."""
+        variant = game.variant
+        if (variant.board_size != self.board_size or
+            len(variant.sizes) != self.num_sizes or
+            variant.num_stacks != self.num_stacks):
+            return None
+
+        key, symmetry = position_hash(game.board, game.on_deck.player)
+        record = self.find(key)
+        if record is None:
+            return None
+
+        source, dest, score = record
+        return decode_move(game, source, dest, symmetry)
+
+
+def write_book(path, entries, board_size, num_sizes, num_stacks):
+    """Write {hash: (source, dest, score)} entries to a book file."""
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, board_size, num_sizes, num_stacks,
+                            len(entries)))
+        for key in sorted(entries):
+            source, dest, score = entries[key]
+            f.write(RECORD.pack(key, source, dest, score))
+
+
+def search_positions(game, plies, player, entries, expanded=None):
+    """
+    Visit every position reachable from the game in fewer than the given
+    number of plies, searching each new one and recording its best move.
+
+    expanded holds the most plies each position has been visited with.
+    A position can come up again by a shorter line of play, with more
+    plies left, and is then visited again so nothing after it is missed.
+    """
+    if plies == 0:
+        return
+    if expanded is None:
+        expanded = {}
+
+    key, symmetry = position_hash(game.board, game.on_deck.player)
+    if expanded.get(key, 0) >= plies:
+        return
+    expanded[key] = plies
+
+    if key not in entries:
+        (piece, dest), score = player.best_move(game, player.depth)
+        source, dest = encode_move(game.board, piece, dest, symmetry)
+        entries[key] = source, dest, score
+
+    for piece, dest in game.available_moves():
+        token, winner = game._apply(piece, dest)
+        if winner is None:
+            search_positions(game, plies - 1, player, entries, expanded)
+        game._undo(token)
+
+
+def build_book(path, plies, depth):
+    """
+    Build a book of the positions in the first plies of a game, each
+    searched depth plies deep, and write it to path.
+    """
+    game = Game(Player('white'), Player('black'))
+    searcher = MinimaxPlayer('book', depth=depth)
+
+    entries = {}
+    search_positions(game, plies, searcher, entries)
+    variant = game.variant
+    write_book(path, entries, variant.board_size, len(variant.sizes),
+               variant.num_stacks)
+    return entries
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gobblet opening books')
+    commands = parser.add_subparsers(dest='command')
+
+    build = commands.add_parser('build', help='build a book by searching')
+    build.add_argument('path')
+    build.add_argument('--plies', type=int, default=4)
+    build.add_argument('--depth', type=int, default=3)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        entries = build_book(args.path, args.plies, args.depth)
+        print('{} positions written to {}'.format(len(entries), args.path))
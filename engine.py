@@ -0,0 +1,266 @@
+"""
+A text protocol for running Gobblet players in their own long-lived
+processes, modelled on chess's UCI.
+
+The engine process reads commands on stdin and answers on stdout, a line
+at a time. Since it stays up from move to move and game to game, it can
+keep what it's learnt (e.g. MinimaxPlayer's transposition table) and it
+only pays for starting up once. Since it's a separate process, it can't
+touch the game's board, dugouts or anything else of the host's.
+
+    gobblet                 ->  id name <name>
+                                gobbletok
+    isready                 ->  readyok
+    newgame                     (a new game is starting)
+    position <position>         (in the text notation, see notation)
+    go [depth N] [movetime MS]
+                            ->  info depth <n> score <score> nodes <n>
+                                bestmove <move>
+    quit
+
+Moves are in the move notation, "D@b3" or "b3-c4", and "bestmove none"
+means the engine has no move. Unknown commands are ignored.
+
+To run MinimaxPlayer as an engine:
+
+    python -m engine --depth 3
+
+and to play it in a game, from the host:
+
+    from engine import EnginePlayer
+
+    white = EnginePlayer('white', move_time=1.0)
+    ...
+    white.close()
+"""
+import argparse
+import os
+import select
+import subprocess
+import sys
+import time
+
+from gobblet import Forfeit, Game, MinimaxPlayer, Move, Player, Position
+import notation
+
+
+class EngineError(Exception): pass
+
+
+def _parse_go(fields):
+    options = {}
+    for name, value in zip(fields[::2], fields[1::2]):
+        try:
+            options[name] = int(value)
+        except ValueError:
+            pass
+    return options.get('depth'), options.get('movetime')
+
+
+def run_engine(player, stdin=sys.stdin, stdout=sys.stdout):
+    """
+    Answer commands from stdin on stdout with the player's moves, until
+    told to quit or stdin is closed.
+
+    A MinimaxPlayer searches with think(), to the depth and time limit
+    given with "go", or its own if none are given. Any other player is
+    just asked for its move.
+    """
+    def send(line):
+        stdout.write(line + '\n')
+        stdout.flush()
+
+    position = None
+    while True:
+        line = stdin.readline()
+        if not line:
+            return
+
+        fields = line.split()
+        if not fields:
+            continue
+        command = fields[0]
+
+        if command == 'gobblet':
+            send('id name {}'.format(player.name))
+            send('gobbletok')
+        elif command == 'isready':
+            send('readyok')
+        elif command == 'position':
+            try:
+                position = notation.from_text(' '.join(fields[1:]))
+            except notation.NotationError:
+                position = None
+        elif command == 'go':
+            depth, movetime = _parse_go(fields[1:])
+            send('bestmove {}'.format(
+                _engine_move(player, position, depth, movetime, send)))
+        elif command == 'quit':
+            return
+
+
+def _engine_move(player, position, depth, movetime, send):
+    if position is None:
+        return 'none'
+
+    game = position.to_game_for(player, Player('opponent'))
+
+    if isinstance(player, MinimaxPlayer):
+        time_limit = player.time_limit
+        if movetime is not None:
+            time_limit = movetime / 1000.0
+        if time_limit is None and depth is None:
+            depth = player.depth
+
+        best, score, nodes, searched = player.think(game, depth,
+                                                    time_limit)
+        send('info depth {} score {} nodes {}'.format(searched, score,
+                                                      nodes))
+    else:
+        try:
+            best = player(game.board, game.on_deck.dugout)
+        except Forfeit:
+            best = None
+
+    if best is None:
+        return 'none'
+    piece, dest = best
+    return notation.move_to_text(
+        Move(piece.size.value, game.board.find(piece), dest))
+
+
+class EnginePlayer(Player):
+
+    """
+    A player whose moves come from an engine process, started once by
+    running command (by default, MinimaxPlayer from this module) and kept
+    until close().
+
+    The engine gets move_time seconds per move, and search_depth plies if
+    given. An engine which doesn't answer in time, or crashes, or answers
+    with a move it can't play, forfeits.
+    """
+
+    # Time allowed on top of move_time for the engine's answer to arrive.
+    GRACE = 1.0
+
+    def __init__(self, name, command=None, move_time=5.0, search_depth=None,
+                 startup_time=10.0):
+        super(EnginePlayer, self).__init__(name)
+        if command is None:
+            here = os.path.dirname(os.path.abspath(__file__))
+            command = [sys.executable, os.path.join(here, 'engine.py')]
+
+        self.move_time = move_time
+        self.search_depth = search_depth
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+        self._buffer = b''
+
+        self.engine_name = None
+        deadline = time.time() + startup_time
+        try:
+            self._send('gobblet')
+            while True:
+                line = self._read_line(deadline)
+                if line.startswith('id name '):
+                    self.engine_name = line[len('id name '):]
+                elif line == 'gobbletok':
+                    break
+        except EngineError:
+            self.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _send(self, line):
+        try:
+            self.process.stdin.write(line.encode('ascii') + b'\n')
+            self.process.stdin.flush()
+        except (IOError, OSError, ValueError):
+            raise EngineError('Engine has exited')
+
+    def _read_line(self, deadline):
+        # Read straight from the pipe, so the deadline can be enforced
+        # with select() without a file object buffering lines behind it.
+        fd = self.process.stdout.fileno()
+        while b'\n' not in self._buffer:
+            timeout = deadline - time.time()
+            if timeout <= 0 or not select.select([fd], [], [], timeout)[0]:
+                raise EngineError('Engine took too long')
+            data = os.read(fd, 4096)
+            if not data:
+                raise EngineError('Engine has exited')
+            self._buffer += data
+
+        line, self._buffer = self._buffer.split(b'\n', 1)
+        return line.decode('ascii').strip()
+
+    def new_game(self):
+        self._send('newgame')
+
+    def is_ready(self, timeout=10.0):
+        self._send('isready')
+        deadline = time.time() + timeout
+        while self._read_line(deadline) != 'readyok':
+            pass
+
+    def move(self, board, dugout):
+        game = Game.from_board(board, dugout, self)
+        position = Position.from_game(game)
+
+        go = 'go movetime {}'.format(int(self.move_time * 1000))
+        if self.search_depth is not None:
+            go += ' depth {}'.format(self.search_depth)
+
+        try:
+            self._send('position ' + notation.to_text(position))
+            self._send(go)
+
+            deadline = time.time() + self.move_time + self.GRACE
+            line = self._read_line(deadline)
+            while not line.startswith('bestmove '):
+                line = self._read_line(deadline)
+        except EngineError:
+            self.close()
+            raise Forfeit()
+
+        try:
+            move = notation.move_from_text(line.split()[1], position)
+        except notation.NotationError:
+            raise Forfeit()
+
+        return game.legal_move(move)
+
+    def close(self, timeout=1.0):
+        if self.process.poll() is None:
+            try:
+                self._send('quit')
+            except EngineError:
+                pass
+
+            deadline = time.time() + timeout
+            while self.process.poll() is None and time.time() < deadline:
+                time.sleep(0.01)
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run MinimaxPlayer as an engine on stdin/stdout')
+    parser.add_argument('--name', default='minimax')
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--table-size', type=int, default=1000000)
+
+    args = parser.parse_args()
+    run_engine(MinimaxPlayer(args.name, depth=args.depth,
+                             table_size=args.table_size))
@@ -0,0 +1,163 @@
+"""
+Observers which log a game's events (see Game.add_observer) to files.
+
+Writing a line to a file on every move makes long runs of games spend
+their time waiting on the disk, so sinks keep events in memory and write
+them out batch_size at a time, in one go. For runs with too many games
+to log every move, sample is the fraction of move events to keep, picked
+at random. Wins, forfeits, invalid moves and draws are always kept.
+
+JSONSink writes a line of JSON per event:
+
+    {"event": "move", "turn": 3, "player": "white", "move": "D@b3"}
+
+BinarySink writes a fixed size record per event, followed by the
+position after it in the binary notation (see notation). read_binary()
+reads them back.
+
+    with JSONSink('games.ndjson', sample=0.01) as sink:
+        for i in range(10000):
+            game = Game(white, black)
+            game.add_observer(sink)
+            game.play(max_turns=200)
+"""
+from collections import namedtuple
+import json
+import random
+import struct
+
+from gobblet import Events, Move, Position
+import notation
+
+
+# Kind, turn, side (0 for white, 1 for black, 2 for nobody), piece size,
+# source row and column (-1 for the dugout), dest row and column. The
+# move fields are -1 for events other than moves.
+RECORD = struct.Struct('>BIBbbbbb')
+
+KINDS = dict((kind, i) for i, kind in enumerate(Events.all))
+
+BinaryEvent = namedtuple('BinaryEvent', 'kind turn side move position')
+
+
+class EventSink(object):
+
+    """
+    Base class for sinks. Subclasses say how to turn an event into
+    something to write, with encode(), and how to write it, with write().
+
+    The sink writes to path, which may also be an open file. Use as a
+    context manager, or call close() when done, to write out what's left.
+    """
+
+    mode = 'a'
+
+    def __init__(self, path, batch_size=1000, sample=1.0, seed=None):
+        if hasattr(path, 'write'):
+            self.file = path
+            self._owns_file = False
+        else:
+            self.file = open(path, self.mode)
+            self._owns_file = True
+
+        self.batch_size = batch_size
+        self.sample = sample
+        self._random = random.Random(seed)
+        self._pending = []
+
+    def __call__(self, event):
+        if (event.kind == Events.move and self.sample < 1.0 and
+            self._random.random() >= self.sample):
+            return
+
+        self._pending.append(self.encode(event))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def encode(self, event):
+        raise NotImplementedError()
+
+    def write(self, encoded):
+        raise NotImplementedError()
+
+    def flush(self):
+        if self._pending:
+            self.write(self._pending)
+            self._pending = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self._owns_file:
+            self.file.close()
+
+
+class JSONSink(EventSink):
+
+    def encode(self, event):
+        record = {'event': event.kind, 'turn': event.turn}
+        if event.player is not None:
+            record['player'] = event.player.name
+        if event.move is not None:
+            record['move'] = notation.move_to_text(event.move)
+        if event.reason is not None:
+            record['reason'] = event.reason
+        return json.dumps(record, sort_keys=True)
+
+    def write(self, encoded):
+        self.file.write('\n'.join(encoded) + '\n')
+
+
+class BinarySink(EventSink):
+
+    mode = 'ab'
+
+    def encode(self, event):
+        game = event.game
+        if event.player is None:
+            side = 2
+        else:
+            side = 0 if event.player is game.white.player else 1
+
+        move = event.move
+        if move is None:
+            fields = (-1, -1, -1, -1, -1)
+        else:
+            source = move.source or (-1, -1)
+            fields = (move.size,) + tuple(source) + tuple(move.dest)
+
+        return (RECORD.pack(KINDS[event.kind], event.turn, side, *fields) +
+                notation.to_bytes(Position.from_game(game)))
+
+    def write(self, encoded):
+        self.file.write(b''.join(encoded))
+
+
+def read_binary(path, variant):
+    """Yield a BinaryEvent for each record in a BinarySink's file."""
+    size = RECORD.size + notation.record_size(variant)
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(size)
+            if len(data) < size:
+                return
+
+            kind, turn, side, piece_size, source_row, source_col, \
+                dest_row, dest_col = RECORD.unpack_from(data)
+
+            move = None
+            if piece_size >= 0:
+                source = None
+                if source_row >= 0:
+                    source = source_row, source_col
+                move = Move(piece_size, source, (dest_row, dest_col))
+
+            yield BinaryEvent(Events.all[kind], turn,
+                              side if side < 2 else None, move,
+                              notation.from_bytes(data[RECORD.size:], variant))
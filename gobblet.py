@@ -1,8 +1,8 @@
 from collections import namedtuple
 from copy import copy, deepcopy
 from functools import total_ordering
-import itertools
 import random
+import time
 
 
 @total_ordering
@@ -66,9 +66,9 @@ class Stack(object):
         return self.pieces[-1]
 
     def push(self, piece):
-        if self.pieces and piece.size >= self.top().size:
+        if self.pieces and piece.size <= self.top().size:
             m = "Can't push piece on to stack because its size is " \
-                "greater than or equal to the piece on top of the stack"
+                "smaller than or equal to the piece on top of the stack"
             raise ValueError(m)
 
         self.pieces.append(piece)
@@ -89,6 +89,8 @@ class Dugout(object):
     dugout onto the board.
     """
 
+    NoSuchPiece = NoSuchPiece
+
     def __init__(self, stacks):
         self.stacks = stacks
 
@@ -106,6 +108,15 @@ class Dugout(object):
                 pass
         return available
 
+    def use_piece(self, piece):
+        """Pop the piece off the top of its stack and return that stack."""
+        for stack in self.stacks:
+            if stack and stack.top() is piece:
+                stack.pop()
+                return stack
+
+        raise NoSuchPiece(piece)
+
 
 class Board(object):
 
@@ -159,6 +170,248 @@ class Board(object):
                 pass
 
 
+def win_lines(size):
+    # The groups of cells that win the game when one player covers all of
+    # them: each row, each column, and the two diagonals.
+    lines = []
+    for i in range(size):
+        lines.append([(i, col) for col in range(size)])
+        lines.append([(row, i) for row in range(size)])
+
+    lines.append([(i, i) for i in range(size)])
+    lines.append([(size - i - 1, i) for i in range(size)])
+    return lines
+
+
+_symmetries = {}
+
+def board_symmetries(size):
+    """
+    Return the eight ways a square board can be rotated or reflected
+    onto itself, each as a dict mapping a cell's key to where it lands.
+    The first one is the identity.
+    """
+    if size not in _symmetries:
+        last = size - 1
+        transforms = [
+            lambda r, c: (r, c),
+            lambda r, c: (c, last - r),
+            lambda r, c: (last - r, last - c),
+            lambda r, c: (last - c, r),
+            lambda r, c: (r, last - c),
+            lambda r, c: (last - r, c),
+            lambda r, c: (c, r),
+            lambda r, c: (last - c, last - r),
+        ]
+        keys = [(r, c) for r in range(size) for c in range(size)]
+        _symmetries[size] = [dict((key, transform(*key)) for key in keys)
+                             for transform in transforms]
+    return _symmetries[size]
+
+
+class Variant(object):
+
+    """
+    The rules a game is played with: the board size, the piece sizes and
+    the number of dugout stacks each player has. Also holds the tables
+    worked out from them, such as the winning lines, so they're built
+    once and shared by every game played with the same rules.
+
+    Use Variant.get() rather than creating these directly.
+    """
+
+    _variants = {}
+
+    def __init__(self, board_size, sizes, num_stacks):
+        self.board_size = board_size
+        self.sizes = tuple(sorted(sizes))
+        self.num_stacks = num_stacks
+
+        self.keys = [(row, col) for row in range(board_size)
+                     for col in range(board_size)]
+        self.lines = win_lines(board_size)
+
+        # The winning lines each cell is part of, by index into lines.
+        self.cell_lines = dict((key, []) for key in self.keys)
+        for line_i, line in enumerate(self.lines):
+            for key in line:
+                self.cell_lines[key].append(line_i)
+
+        # The same lines as bitmasks, with a bit per cell.
+        self.cell_bits = dict((key, 1 << i) for i, key in enumerate(self.keys))
+        self.line_masks = [sum(self.cell_bits[key] for key in line)
+                           for line in self.lines]
+
+    def __repr__(self):
+        return 'Variant({}, {}, {})'.format(
+            self.board_size, [size.name for size in self.sizes],
+            self.num_stacks)
+
+    @classmethod
+    def get(cls, board_size, sizes, num_stacks):
+        key = (board_size, tuple(sorted(size.value for size in sizes)),
+               num_stacks)
+        if key not in cls._variants:
+            cls._variants[key] = cls(board_size, sizes, num_stacks)
+        return cls._variants[key]
+
+
+_zobrist = {}
+
+def zobrist_table(size):
+    """
+    Random numbers for hashing positions, one for each combination of
+    cell, owner (the player to move or the opponent) and piece size.
+    They're seeded, so hashes are the same from run to run.
+    """
+    if size not in _zobrist:
+        rand = random.Random(size)
+        _zobrist[size] = dict(
+            ((r, c), [[rand.getrandbits(64) for _ in Sizes.all]
+                      for _ in range(2)])
+            for r in range(size) for c in range(size))
+    return _zobrist[size]
+
+
+def position_hash(board, player, symmetric=True):
+    """
+    Hash the pieces on the board from the point of view of player, whose
+    turn it is, so the same position hashes the same whichever color
+    is moving. All eight symmetries of the board hash to the same value,
+    unless symmetric is False, which is quicker.
+
+    Returns the hash and the symmetry (an index into board_symmetries())
+    which maps the board onto the position the hash was taken from.
+
+    Only the board is hashed: the dugouts hold whatever pieces aren't on
+    the board, so they follow from it.
+    """
+    table = zobrist_table(board.size)
+    symmetries = board_symmetries(board.size)
+    if not symmetric:
+        symmetries = symmetries[:1]
+    hashes = [0] * len(symmetries)
+
+    for key, cell in board:
+        for piece in cell.pieces:
+            slot = 0 if piece.player is player else 1
+            size = piece.size.value
+            for i, symmetry in enumerate(symmetries):
+                hashes[i] ^= table[symmetry[key]][slot][size]
+
+    key = min(hashes)
+    return key, hashes.index(key)
+
+
+class ThreatIndex(object):
+
+    """
+    Keeps count of each player's exposed pieces (the pieces on top of
+    a cell) along every winning line of the board.
+
+    The counts are updated one cell at a time, with update(key), whenever
+    the top of a cell changes, so questions like "does black have three
+    in a row?" or "which cell would complete white's line?" don't need
+    to rescan the board.
+
+    Players are numbered by "slot": 0 for the first player passed in,
+    1 for the second.
+
+    If you push pieces onto the board by hand, call rebuild() afterwards.
+    """
+
+    def __init__(self, board, players, variant):
+        self.board = board
+        self.players = list(players)
+        self.slots = dict((player, i) for i, player in enumerate(players))
+
+        self.lines = variant.lines
+        self.cell_lines = variant.cell_lines
+
+        self.rebuild()
+
+    def rebuild(self):
+        num_lines = len(self.lines)
+        self.counts = [[0] * num_lines, [0] * num_lines]
+        # histogram[slot][n] is the number of lines where the player has
+        # exactly n exposed pieces.
+        self.histogram = [[num_lines] + [0] * self.board.size,
+                          [num_lines] + [0] * self.board.size]
+        # Lines where the player is one piece short of a win.
+        self.three_lines = [set(), set()]
+        self.owners = dict((key, None) for key in self.cell_lines)
+
+        for key in self.cell_lines:
+            self.update(key)
+
+    def _adjust(self, slot, line_i, delta):
+        counts = self.counts[slot]
+        histogram = self.histogram[slot]
+
+        histogram[counts[line_i]] -= 1
+        counts[line_i] += delta
+        histogram[counts[line_i]] += 1
+
+        if counts[line_i] == self.board.size - 1:
+            self.three_lines[slot].add(line_i)
+        else:
+            self.three_lines[slot].discard(line_i)
+
+    def update(self, key):
+        """Record whatever piece is now on top of the cell at key."""
+        cell = self.board[key]
+        new = self.slots.get(cell.top().player) if cell else None
+        old = self.owners[key]
+
+        if new == old:
+            return
+
+        self.owners[key] = new
+        for line_i in self.cell_lines[key]:
+            if old is not None:
+                self._adjust(old, line_i, -1)
+            if new is not None:
+                self._adjust(new, line_i, 1)
+
+    def opponent(self, player):
+        return self.players[1 - self.slots[player]]
+
+    def winner(self):
+        """Return the player who has a complete line, if any."""
+        for slot in (0, 1):
+            if self.histogram[slot][self.board.size]:
+                return self.players[slot]
+
+    def has_won(self, player):
+        return bool(self.histogram[self.slots[player]][self.board.size])
+
+    def open_cells(self, player):
+        """
+        Return the cells that would complete one of the player's lines,
+        i.e. the remaining cell of each line where the player has all
+        but one of the pieces exposed.
+        """
+        slot = self.slots[player]
+        cells = set()
+        for line_i in self.three_lines[slot]:
+            for key in self.lines[line_i]:
+                if self.owners[key] != slot:
+                    cells.add(key)
+        return cells
+
+    def in_three(self, key, player):
+        """
+        True if the player's piece on top of the cell at key is part of
+        a line where the player has all but one of the pieces exposed.
+        """
+        slot = self.slots.get(player)
+        if slot is None or self.owners[key] != slot:
+            return False
+
+        three_lines = self.three_lines[slot]
+        return any(line_i in three_lines for line_i in self.cell_lines[key])
+
+
 class Player(object):
 
     def __init__(self, name):
@@ -180,20 +433,49 @@ class Winner(Exception):
         self.player = player
 
 
+class Events:
+    # The kinds of event a game tells its observers about.
+    move = 'move'
+    invalid = 'invalid'
+    win = 'win'
+    forfeit = 'forfeit'
+    draw = 'draw'
+
+    all = [move, invalid, win, forfeit, draw]
+
+
+# What observers are called with. turn counts the moves made before this
+# one; player is the player who moved, won, forfeited or made an invalid
+# move; move is a Move for move events; reason is the error message of
+# an invalid move.
+Event = namedtuple('Event', 'kind game turn player move reason')
+
+
 class Game(object):
 
+    # The standard game. Pass board_size, sizes or num_stacks to play
+    # a variant, e.g. Game(white, black, board_size=3, num_stacks=2)
     BOARD_SIZE = 4
     NUM_STACKS = 3
+    SIZES = Sizes.all
 
     PlayerInfo = namedtuple('PlayerInfo', 'player dugout')
 
-    def __init__(self, white, black):
-        self.board = Board(self.BOARD_SIZE)
+    def __init__(self, white, black,
+                 board_size=None, sizes=None, num_stacks=None):
+        self.variant = Variant.get(
+            board_size or self.BOARD_SIZE,
+            sizes or self.SIZES,
+            self.NUM_STACKS if num_stacks is None else num_stacks)
+
+        self.board = Board(self.variant.board_size)
 
-        white_stacks = create_stacks(white, Sizes.all, self.NUM_STACKS)
+        white_stacks = create_stacks(white, self.variant.sizes,
+                                     self.variant.num_stacks)
         self.white_dugout = Dugout(white_stacks)
 
-        black_stacks = create_stacks(black, Sizes.all, self.NUM_STACKS)
+        black_stacks = create_stacks(black, self.variant.sizes,
+                                     self.variant.num_stacks)
         self.black_dugout = Dugout(black_stacks)
 
         self.white = self.PlayerInfo(white, self.white_dugout)
@@ -201,6 +483,54 @@ class Game(object):
 
         self.on_deck, self.off_deck = self.white, self.black
 
+        self.threats = ThreatIndex(self.board, (white, black), self.variant)
+
+        self.turn = 0
+        self.observers = []
+
+    @classmethod
+    def from_board(cls, board, dugout, player):
+        """
+        Rebuild a game from what a player algorithm is given on its turn,
+        with that player on deck, so the algorithm can look ahead.
+
+        The opponent's dugout isn't passed to players, so it's worked out
+        from the opponent's pieces on the board (see remaining_stacks()).
+        The piece sizes in play are the sizes of the player's own pieces,
+        which are all either on the board or in their dugout.
+        """
+        opponent = None
+        sizes = {}
+        for key, cell in board:
+            for piece in cell.pieces:
+                if piece.player is not player:
+                    opponent = piece.player
+                else:
+                    sizes[piece.size.value] = piece.size
+
+        for stack in dugout.stacks:
+            for piece in stack.pieces:
+                sizes[piece.size.value] = piece.size
+
+        if opponent is None:
+            opponent = Player('opponent')
+
+        game = cls(player, opponent, board.size, list(sizes.values()),
+                   len(dugout.stacks))
+        game.board = copy(board)
+        game.white_dugout = copy(dugout)
+
+        stacks = remaining_stacks(board, opponent, game.variant.sizes,
+                                  game.variant.num_stacks)
+        game.black_dugout = Dugout(stacks)
+
+        game.white = cls.PlayerInfo(player, game.white_dugout)
+        game.black = cls.PlayerInfo(opponent, game.black_dugout)
+        game.on_deck, game.off_deck = game.white, game.black
+        game.threats = ThreatIndex(game.board, (player, opponent),
+                                   game.variant)
+        return game
+
     def _validate(self, player, dugout, piece, dest):
 
         if piece is None:
@@ -235,61 +565,33 @@ class Game(object):
 
         if dest_cell and piece.size <= dest_cell.top().size:
             raise InvalidMove("Can't cover a piece of equal or larger size")
-            
+
+        # A piece coming from the dugout may only cover a piece which is
+        # part of an opponent's three-in-a-row.
+        if (dest_cell and source_pos is None and
+            not self.threats.in_three(dest, self.threats.opponent(player))):
+            raise InvalidMove("Can only cover a piece from the dugout "
+                              "when it is part of a three-in-a-row")
 
     def _check_win(self, board):
+        # Collect the cells each player has a piece on top of as a bitmask,
+        # then check it against the precomputed bitmask of each row,
+        # column and diagonal.
+        cell_bits = self.variant.cell_bits
+        owned = {}
+        for key, cell in board:
+            if cell:
+                player = cell.top().player
+                owned[player] = owned.get(player, 0) | cell_bits[key]
 
-        def check_cells(cells):
-            players = []
-            for cell in cells:
-                if cell:
-                    players.append(cell.top().player)
-                else:
-                    players.append(None)
-                
-            first = players[0]
-            # Compare every cell after the first with the first cell
-            # If they are all the same as the first, they'll all be True,
-            # so all() will return True, meaning it's a win.
-            if first and all(player == first for player in players):
-                return first
-
-        def gen_cells_to_check():
-            # Generate the groups of cells that need to be checked:
-            # each row, each column, and the two diagonals.
-            diagonal_a = []
-            diagonal_b = []
-
-            for i in range(board.size):
-                # Rows
-                yield board.cells[i]
-                # Columns
-                yield board.get_column(i)
-
-                diagonal_a.append(board[i, i])
-
-                row = board.size - i - 1
-                col = i
-                diagonal_b.append(board[row, col])
-
-            # The two diagonals
-            yield diagonal_a
-            yield diagonal_b
-
-        for cells in gen_cells_to_check():
-            winner = check_cells(cells)
-            if winner:
-                return winner
+        for line in self.variant.line_masks:
+            for player, cells in owned.items():
+                if player and cells & line == line:
+                    return player
 
     def _use_piece(self, dugout, piece):
-        for stack in dugout.stacks:
-            try:
-                if stack.top() == piece:
-                    return stack.pop()
-            except IndexError:
-                pass
-
-        raise NoSuchPiece(piece)
+        dugout.use_piece(piece)
+        return piece
 
     def _commit(self, player, dugout, piece, dest):
 
@@ -298,34 +600,206 @@ class Game(object):
         except NoSuchPiece:
             pos = self.board.find(piece)
             self.board[pos].pop()
+            self.threats.update(pos)
 
         winner = self._check_win(self.board)
         if winner:
             raise Winner(winner)
 
         self.board[dest].push(piece)
+        self.threats.update(dest)
 
         winner = self._check_win(self.board)
         if winner:
             raise Winner(winner)
 
-    def move(self, player, dugout):
-        piece, dest = player(self.board, dugout)
+    def available_moves(self):
+        """Return the legal moves of the player on deck, as (piece, dest)."""
+        player, dugout = self.on_deck
+        return [(piece, dest) for dest, piece in
+                get_available_moves(self.board, dugout, player, self.threats)]
+
+    def _apply(self, piece, dest):
+        """
+        Play a move for the player on deck without validating it, for
+        algorithms searching ahead. Returns an undo token for _undo()
+        and the winner, if the move ended the game.
+
+        The winner is decided the same way as in _commit(): lifting a piece
+        which reveals a line ends the game before the piece is placed.
+        """
+        player, dugout = self.on_deck
+        opponent = self.off_deck.player
+
+        source = self.board.find(piece)
+        if source is None:
+            source = dugout.use_piece(piece)
+        else:
+            self.board[source].pop()
+            self.threats.update(source)
+
+        self.on_deck, self.off_deck = self.off_deck, self.on_deck
+
+        winner = self.threats.winner()
+        if winner is not None:
+            if self.threats.has_won(opponent):
+                winner = opponent
+            return (piece, source, None), winner
+
+        self.board[dest].push(piece)
+        self.threats.update(dest)
+
+        winner = self.threats.winner()
+        if winner is not None and self.threats.has_won(player):
+            winner = player
+        return (piece, source, dest), winner
+
+    def _undo(self, token):
+        piece, source, dest = token
 
+        if dest is not None:
+            self.board[dest].pop()
+            self.threats.update(dest)
+
+        if isinstance(source, Stack):
+            source.pieces.append(piece)
+        else:
+            self.board[source].push(piece)
+            self.threats.update(source)
+
+        self.on_deck, self.off_deck = self.off_deck, self.on_deck
+
+    def find_move(self, move):
+        """
+        Return the (piece, dest) for a Move by the player on deck, or None
+        if they have no such piece to move.
+        """
+        size, source, dest = move
+        player, dugout = self.on_deck
+        if source is None:
+            for piece in dugout.available:
+                if piece.size.value == size:
+                    return piece, dest
+        else:
+            try:
+                cell = self.board[source]
+            except IndexError:
+                return None
+            if cell and cell.top().player is player:
+                return cell.top(), dest
+
+    def legal_move(self, move):
+        """
+        Return the (piece, dest) for a Move by the player on deck, or raise
+        Forfeit if they have no such piece or the move isn't allowed. For
+        player algorithms whose moves come from outside the game, such as
+        another process.
+
+        In a game made by from_board(), the board and dugout are copies,
+        but the pieces in them are the real ones, so the move returned
+        can be handed back to the real game.
+        """
+        found = self.find_move(move)
+        if found is None:
+            raise Forfeit()
+
+        player, dugout = self.on_deck
+        try:
+            self._validate(player, dugout, *found)
+        except InvalidMove:
+            raise Forfeit()
+        return found
+
+    def add_observer(self, observer):
+        """
+        Call observer with an Event for each move, invalid move, win,
+        forfeit or draw from now on. See events.py for observers which
+        log events to files.
+        """
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def _notify(self, kind, player, move=None, reason=None):
+        event = Event(kind, self, self.turn, player, move, reason)
+        for observer in self.observers:
+            observer(event)
+
+    def _play(self, player, dugout, piece, dest):
         self._validate(player, dugout, piece, dest)
-        self._commit(player, dugout, piece, dest)
+        if not self.observers:
+            self._commit(player, dugout, piece, dest)
+            return
+
+        move = Move(piece.size.value, self.board.find(piece),
+                    (int(dest[0]), int(dest[1])))
+        try:
+            self._commit(player, dugout, piece, dest)
+        finally:
+            self._notify(Events.move, player, move)
+
+    def submit(self, piece, dest):
+        """
+        Play a move for the player on deck, as tick() does with the move
+        their algorithm returns, for players who can't be called for a
+        move, such as players on the other end of a network connection.
+
+        Returns the winner, if the move ended the game. Raises InvalidMove
+        if the move isn't allowed.
+        """
+        player, dugout = self.on_deck
+        try:
+            self._play(player, dugout, piece, dest)
+        except InvalidMove as e:
+            if self.observers:
+                self._notify(Events.invalid, player, reason=str(e))
+            raise
+        except Winner as e:
+            if self.observers:
+                self._notify(Events.win, e.player)
+            return e.player
+
+        self.turn += 1
+        self.on_deck, self.off_deck = self.off_deck, self.on_deck
+
+    def move(self, player, dugout):
+        piece, dest = player(self.board, dugout)
+        self._play(player, dugout, piece, dest)
 
     def tick(self):
+        player = self.on_deck.player
         try:
-            self.move(self.on_deck.player, self.on_deck.dugout)
+            self.move(player, self.on_deck.dugout)
         except Forfeit:
+            if self.observers:
+                self._notify(Events.forfeit, player)
             return self.off_deck.player
+        except InvalidMove as e:
+            if self.observers:
+                self._notify(Events.invalid, player, reason=str(e))
+            raise
         except Winner as e:
+            if self.observers:
+                self._notify(Events.win, e.player)
             return e.player
 
+        self.turn += 1
         # Swap on_deck and off_deck
         self.on_deck, self.off_deck = self.off_deck, self.on_deck
 
+    def play(self, max_turns=None):
+        """
+        Tick until someone wins, and return the winner. If max_turns
+        moves pass first, the game is a draw, and None is returned.
+        """
+        while max_turns is None or self.turn < max_turns:
+            winner = self.tick()
+            if winner is not None:
+                return winner
+
+        if self.observers:
+            self._notify(Events.draw, None)
 
 
 def create_stacks(player, sizes, num_stacks):
@@ -353,6 +827,261 @@ def create_stacks(player, sizes, num_stacks):
     return stacks
 
 
+def remaining_stacks(board, player, sizes, num_stacks):
+    # Work out a player's dugout from their pieces on the board.
+    # Pieces leave the dugout stacks largest first, so if two extra large
+    # pieces and one large piece are on the board, two stacks have lost
+    # their extra large piece and one of those has also lost its large
+    # piece. Which stack is which doesn't matter.
+    used = dict((size.value, 0) for size in sizes)
+    for key, cell in board:
+        for piece in cell.pieces:
+            if piece.player is player:
+                used[piece.size.value] += 1
+
+    stacks = []
+    for stack_i in xrange(num_stacks):
+        pieces = [Piece(player, size) for size in sizes
+                  if stack_i >= used[size.value]]
+        stacks.append(Stack(pieces))
+    return stacks
+
+
+# A move in a Position: the value of the size of the piece moved, the cell
+# it's moved from (None for a piece from the dugout) and the cell it's
+# moved to.
+Move = namedtuple('Move', 'size source dest')
+
+
+class Position(object):
+
+    """
+    An immutable, hashable snapshot of a game: the pieces in every cell,
+    the pieces left in each dugout and whose turn it is.
+
+    play() returns a new position instead of changing this one. The new
+    position shares every row of the board, cell and dugout the move
+    didn't touch with the old one, so a search tree or a replay holding
+    many positions uses memory for what changed between them, not for
+    a whole board each.
+
+    Players are 0 (white) and 1 (black). Each cell is a tuple of
+    (player, size value) pairs from the bottom of the stack up, and each
+    dugout is a tuple of its stack heights, tallest first.
+
+    If a move ends the game, winner is the player who won. A game can
+    end as a piece is lifted, revealing a line, in which case the piece
+    is never placed, the same as in Game.
+    """
+
+    __slots__ = ('variant', 'rows', 'dugouts', 'to_move', 'winner', '_hash')
+
+    def __init__(self, variant, rows, dugouts, to_move=0, winner=None):
+        set_attr = super(Position, self).__setattr__
+        set_attr('variant', variant)
+        set_attr('rows', rows)
+        set_attr('dugouts', dugouts)
+        set_attr('to_move', to_move)
+        set_attr('winner', winner)
+        set_attr('_hash', hash((rows, dugouts, to_move, winner)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and
+                self._hash == other._hash and
+                self.variant is other.variant and
+                self.to_move == other.to_move and
+                self.winner == other.winner and
+                self.dugouts == other.dugouts and
+                self.rows == other.rows)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return 'Position({!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.variant, self.rows, self.dugouts, self.to_move, self.winner)
+
+    def __getitem__(self, key):
+        row, col = key
+        return self.rows[row][col]
+
+    @classmethod
+    def initial(cls, variant):
+        """The position at the start of a game."""
+        empty_row = ((),) * variant.board_size
+        rows = (empty_row,) * variant.board_size
+        dugout = (len(variant.sizes),) * variant.num_stacks
+        return cls(variant, rows, (dugout, dugout))
+
+    @classmethod
+    def from_game(cls, game):
+        white = game.white.player
+
+        rows = []
+        for row in game.board.cells:
+            cells = []
+            for cell in row:
+                cells.append(tuple((0 if piece.player is white else 1,
+                                    piece.size.value)
+                                   for piece in cell.pieces))
+            rows.append(tuple(cells))
+
+        dugouts = tuple(
+            tuple(sorted((len(stack) for stack in dugout.stacks),
+                         reverse=True))
+            for dugout in (game.white.dugout, game.black.dugout))
+
+        to_move = 0 if game.on_deck is game.white else 1
+        return cls(game.variant, tuple(rows), dugouts, to_move)
+
+    def to_game(self, white, black):
+        """Return a new Game, between white and black, in this position."""
+        variant = self.variant
+        game = Game(white, black, variant.board_size, variant.sizes,
+                    variant.num_stacks)
+        sizes = dict((size.value, size) for size in variant.sizes)
+        players = (white, black)
+
+        for key, cell in game.board:
+            for player, size in self[key]:
+                cell.push(Piece(players[player], sizes[size]))
+
+        for info, heights in zip((game.white, game.black), self.dugouts):
+            info.dugout.stacks[:] = [
+                Stack([Piece(info.player, size)
+                       for size in variant.sizes[:height]])
+                for height in heights]
+
+        if self.to_move == 1:
+            game.on_deck, game.off_deck = game.black, game.white
+
+        game.threats.rebuild()
+        return game
+
+    def to_game_for(self, player, opponent):
+        """Return a new Game in this position, with player on deck."""
+        if self.to_move == 0:
+            return self.to_game(player, opponent)
+        return self.to_game(opponent, player)
+
+    def top(self, key):
+        """The (player, size value) on top of a cell, or None."""
+        row, col = key
+        cell = self.rows[row][col]
+        return cell[-1] if cell else None
+
+    def _owns_line(self, line, player):
+        for key in line:
+            top = self.top(key)
+            if top is None or top[0] != player:
+                return False
+        return True
+
+    def _completes(self, key, player):
+        lines = self.variant.lines
+        return any(self._owns_line(lines[line_i], player)
+                   for line_i in self.variant.cell_lines[key])
+
+    def _in_three(self, key, player):
+        # Is the player's piece at key part of a line where they have all
+        # but one of the pieces exposed?
+        lines = self.variant.lines
+        for line_i in self.variant.cell_lines[key]:
+            owned = 0
+            for cell_key in lines[line_i]:
+                top = self.top(cell_key)
+                if top is not None and top[0] == player:
+                    owned += 1
+            if owned >= self.variant.board_size - 1:
+                return True
+        return False
+
+    def moves(self):
+        """Return the legal moves for the player to move."""
+        if self.winner is not None:
+            return []
+
+        player = self.to_move
+        opponent = 1 - player
+        keys = self.variant.keys
+        tops = dict((key, self.top(key)) for key in keys)
+
+        moves = []
+        for height in sorted(set(self.dugouts[player]), reverse=True):
+            if not height:
+                continue
+            size = self.variant.sizes[height - 1].value
+
+            for key in keys:
+                top = tops[key]
+                if top is None:
+                    moves.append(Move(size, None, key))
+                elif (top[1] < size and top[0] == opponent and
+                      self._in_three(key, opponent)):
+                    moves.append(Move(size, None, key))
+
+        for source in keys:
+            piece = tops[source]
+            if piece is None or piece[0] != player:
+                continue
+
+            for dest in keys:
+                top = tops[dest]
+                if dest != source and (top is None or top[1] < piece[1]):
+                    moves.append(Move(piece[1], source, dest))
+
+        return moves
+
+    def _with_cell(self, rows, key, cell):
+        row, col = key
+        cells = rows[row]
+        return rows[:row] + (cells[:col] + (cell,) + cells[col + 1:],) + \
+            rows[row + 1:]
+
+    def play(self, move):
+        """Return the position after the player to move plays the move."""
+        size, source, dest = move
+        player = self.to_move
+        opponent = 1 - player
+        rows = self.rows
+        dugouts = self.dugouts
+
+        if source is None:
+            # Any stack with that size on top will do: they're all the
+            # same height.
+            heights = list(dugouts[player])
+            height = [s.value for s in self.variant.sizes].index(size) + 1
+            heights[heights.index(height)] -= 1
+            heights.sort(reverse=True)
+            dugouts = list(dugouts)
+            dugouts[player] = tuple(heights)
+            dugouts = tuple(dugouts)
+        else:
+            cell = self[source]
+            rows = self._with_cell(rows, source, cell[:-1])
+            lifted = Position(self.variant, rows, dugouts, opponent)
+
+            for slot in (opponent, player):
+                if lifted._completes(source, slot):
+                    return Position(self.variant, rows, dugouts, opponent,
+                                    winner=slot)
+
+        rows = self._with_cell(rows, dest, self[dest] + ((player, size),))
+        placed = Position(self.variant, rows, dugouts, opponent)
+
+        for slot in (player, opponent):
+            if placed._completes(dest, slot):
+                return Position(self.variant, rows, dugouts, opponent,
+                                winner=slot)
+        return placed
+
+
 class RandomPlayer(Player):
     """
     Random movement algorithm. Seems to get stuck around turn 30-50.
@@ -363,13 +1092,12 @@ class RandomPlayer(Player):
 
     def move(self, board, dugout):
 
-        if dugout.available:
+        # Pieces from the dugout can only cover a piece in a three-in-a-row,
+        # so keep things simple and only place them on empty cells.
+        empty = [key for key, cell in board if not cell]
+        if dugout.available and empty:
             piece = dugout.available[0]
-
-            dest = self._random_cell(board)
-            while len(board[dest]) and board[dest].top().size >= piece.size:
-                dest = self._random_cell(board)
-                
+            dest = random.choice(empty)
             return piece, dest
 
         else:
@@ -391,60 +1119,427 @@ class MoveTreeNode(object):
         self.children = []
 
 
+class OutOfTime(Exception): pass
+
+
 class MinimaxPlayer(Player):
-    def score_board(self, board):
-        pass
+
+    """
+    Looks ahead a fixed number of moves (plies) with a minimax search
+    (written in negamax form, with alpha-beta pruning) and scores the
+    positions at the end of each line of play with evaluate().
+
+    Given a time_limit in seconds, it searches one ply deep, then two,
+    and so on, until time runs out or depth is reached, and plays the
+    best move of the deepest search it finished.
+
+    Scores of positions already searched are kept in a transposition
+    table, which lives as long as the player does, so it carries over
+    from move to move. It's cleared when it grows past table_size, and
+    not kept at all if table_size is 0.
+
+    Given quiescence_nodes, positions at the end of the search aren't
+    scored while a capture or a threat is pending: from there, a
+    quiescence search carries on with tactical moves only (see
+    tactical_moves()), for up to QUIESCENCE_DEPTH more plies, and each
+    side may instead stand pat on the position's score. quiescence_nodes
+    is how many tactical moves each call of best_move() may play in all.
+    It's off by default: it makes for stronger play at the same depth,
+    but for the same time, a ply deeper of plain search does as well.
+
+    If given an opening book (see book.OpeningBook), positions found in
+    the book are played from it without searching. If given a tablebase
+    (see tablebase.Tablebase), positions found in it are scored exactly
+    instead of being searched any deeper.
+    """
+
+    WIN = 1000000
+    MAX_DEPTH = 64
+    QUIESCENCE_DEPTH = 4
+
+    # Transposition table entry flags: the score is exact, or only
+    # a lower or upper bound because the search was cut off.
+    EXACT, LOWER, UPPER = range(3)
+
+    def __init__(self, name, depth=2, book=None, tablebase=None,
+                 time_limit=None, table_size=1000000, quiescence_nodes=0):
+        super(MinimaxPlayer, self).__init__(name)
+        self.depth = depth
+        self.book = book
+        self.tablebase = tablebase
+        self.time_limit = time_limit
+        self.table_size = table_size
+        self.quiescence_nodes = quiescence_nodes
+        self.table = {}
+        self.nodes = 0
+        self.deadline = None
+        self._quiescence_left = 0
+
+    def evaluate(self, game):
+        """
+        Score the position for the player on deck. Each line is worth
+        more the more exposed pieces a player has along it, read straight
+        from the game's threat index.
+        """
+        threats = game.threats
+        player = game.on_deck.player
+        opponent = game.off_deck.player
+
+        score = 0
+        for n, count in enumerate(threats.histogram[threats.slots[player]]):
+            score += count * (10 ** n // 10)
+        for n, count in enumerate(threats.histogram[threats.slots[opponent]]):
+            score -= count * (10 ** n // 10)
+        return score
+
+    def ordered_moves(self, game, first=None):
+        """
+        Moves onto a cell that completes a line, the mover's or the
+        opponent's, are tried first so alpha-beta cuts off sooner.
+        The move given as first, usually the best move found by an
+        earlier search, goes before all of them.
+        """
+        threats = game.threats
+        urgent = (threats.open_cells(game.on_deck.player) |
+                  threats.open_cells(game.off_deck.player))
+
+        moves = game.available_moves()
+        moves.sort(key=lambda move: (move != first, move[1] not in urgent))
+        return moves
+
+    def tactical_moves(self, game):
+        """
+        The moves which change the position too much for it to be scored
+        as it stands: moves which win or block a line, covers of the
+        opponent's pieces, and moves which make a three-in-a-row. Those
+        include uncovers, which lift a piece off another of the player's
+        own, so the line it leaves still counts. Wins and blocks come
+        first. Moves which lose at once, by lifting a piece off the last
+        piece of an opponent's line, are left out.
+        """
+        threats = game.threats
+        board = game.board
+        player = game.on_deck.player
+        opponent = game.off_deck.player
+
+        # Placing here would put all but one of a line's pieces down.
+        counts = threats.counts[threats.slots[player]]
+        making_three = board.size - 2
+
+        opponent_open = threats.open_cells(opponent)
+        urgent = threats.open_cells(player) | opponent_open
+
+        # The lines each of the player's pieces on the board gives up when
+        # it's lifted, by id, or None if lifting it loses the game.
+        leaves = {}
+        for key, cell in board:
+            if not cell or cell.top().player is not player:
+                continue
+            if len(cell) == 1:
+                leaves[id(cell.top())] = threats.cell_lines[key]
+            elif cell[-2].player is player:
+                leaves[id(cell.top())] = ()
+            elif key in opponent_open:
+                leaves[id(cell.top())] = None
+            else:
+                leaves[id(cell.top())] = threats.cell_lines[key]
+
+        urgent_moves = []
+        moves = []
+        for piece, dest in game.available_moves():
+            left = leaves.get(id(piece), ())
+            if left is None:
+                continue
+            if dest in urgent:
+                urgent_moves.append((piece, dest))
+            elif board[dest]:
+                if board[dest].top().player is opponent:
+                    moves.append((piece, dest))
+            elif any(counts[line_i] == making_three and line_i not in left
+                     for line_i in threats.cell_lines[dest]):
+                moves.append((piece, dest))
+        return urgent_moves + moves
+
+    def quiesce(self, game, alpha, beta, depth):
+        """
+        Score the position for the player on deck, searching only tactical
+        moves, until none are left, depth runs out or the search's node
+        budget is spent.
+        """
+        self.nodes += 1
+        self._check_time()
+
+        score = self.evaluate(game)
+        if depth == 0 or self._quiescence_left <= 0:
+            return score
+
+        # The player on deck may stand pat, and take the position's score
+        # rather than make a tactical move, since it usually has a quiet
+        # move that does at least as well.
+        if score >= beta:
+            return score
+        best = score
+        alpha = max(alpha, score)
+
+        player = game.on_deck.player
+        for piece, dest in self.tactical_moves(game):
+            if self._quiescence_left <= 0:
+                break
+            self._quiescence_left -= 1
+
+            token, winner = game._apply(piece, dest)
+            try:
+                if winner is None:
+                    move_score = -self.quiesce(game, -beta, -alpha, depth - 1)
+                elif winner is player:
+                    move_score = self.WIN
+                else:
+                    move_score = -self.WIN
+            finally:
+                game._undo(token)
+
+            if move_score > best:
+                best = move_score
+            if move_score > alpha:
+                alpha = move_score
+                if alpha >= beta:
+                    break
+
+        return best
+
+    def tablebase_score(self, found, depth):
+        # Score a tablebase result the way search() scores a win found
+        # by searching, so a win in one ply here is worth the same as
+        # a winning move found at this depth.
+        result, distance = found
+        if result == 1:  # tablebase.WIN
+            return self.WIN + depth + 1 - distance
+        elif result == 2:  # tablebase.LOSS
+            return -self.WIN - depth - 1 + distance
+        return 0
+
+    def _table_move(self, game, move):
+        # Moves are stored as (size, source, dest) rather than with the
+        # piece itself, so they still apply to a different Game object
+        # in the same position.
+        if move is not None:
+            return game.find_move(move)
+
+    def _store(self, key, depth, score, flag, game, move):
+        if not self.table_size:
+            return
+        if len(self.table) >= self.table_size:
+            self.table.clear()
+
+        piece, dest = move
+        move = piece.size.value, game.board.find(piece), dest
+        self.table[key] = depth, score, flag, move
+
+    def _score_move(self, game, piece, dest, depth, alpha, beta):
+        player = game.on_deck.player
+        token, winner = game._apply(piece, dest)
+        try:
+            if winner is None:
+                return -self.search(game, depth - 1, -beta, -alpha)
+            elif winner is player:
+                # Prefer quicker wins and slower losses.
+                return self.WIN + depth
+            else:
+                return -self.WIN - depth
+        finally:
+            game._undo(token)
+
+    def _check_time(self):
+        if (self.deadline is not None and not self.nodes % 256 and
+            time.time() > self.deadline):
+            raise OutOfTime()
+
+    def search(self, game, depth, alpha, beta):
+        self.nodes += 1
+        self._check_time()
+
+        if self.tablebase is not None:
+            found = self.tablebase.probe(game)
+            if found is not None:
+                return self.tablebase_score(found, depth)
+
+        if depth == 0:
+            if self._quiescence_left <= 0:
+                return self.evaluate(game)
+            return self.quiesce(game, alpha, beta, self.QUIESCENCE_DEPTH)
+
+        key = position_hash(game.board, game.on_deck.player,
+                            symmetric=False)[0]
+        first = None
+        entry = self.table.get(key)
+        if entry is not None:
+            entry_depth, score, flag, move = entry
+            if entry_depth >= depth:
+                if flag == self.EXACT:
+                    return score
+                elif flag == self.LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+            first = self._table_move(game, move)
+
+        moves = self.ordered_moves(game, first)
+        if not moves:
+            return 0
+
+        original_alpha = alpha
+        best = best_move = None
+        for piece, dest in moves:
+            score = self._score_move(game, piece, dest, depth, alpha, beta)
+
+            if best is None or score > best:
+                best = score
+                best_move = piece, dest
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+
+        if best <= original_alpha:
+            flag = self.UPPER
+        elif best >= beta:
+            flag = self.LOWER
+        else:
+            flag = self.EXACT
+        self._store(key, depth, best, flag, game, best_move)
+        return best
+
+    def best_move(self, game, depth):
+        """Return the best (piece, dest) for the player on deck and its score."""
+        self.nodes = 0
+        self._quiescence_left = self.quiescence_nodes
+        alpha, beta = -self.WIN * 2, self.WIN * 2
+        best = None
+
+        key = position_hash(game.board, game.on_deck.player,
+                            symmetric=False)[0]
+        entry = self.table.get(key)
+        first = self._table_move(game, entry[3]) if entry else None
+
+        for piece, dest in self.ordered_moves(game, first):
+            score = self._score_move(game, piece, dest, depth, alpha, beta)
+            if best is None or score > alpha:
+                alpha = score
+                best = piece, dest
+
+        if best is not None:
+            self._store(key, depth, alpha, self.EXACT, game, best)
+        return best, alpha
+
+    def think(self, game, depth=None, time_limit=None):
+        """
+        Search one ply deep, then two, and so on up to depth, stopping
+        early if time_limit seconds pass or a forced win or loss is found.
+
+        Returns the best (piece, dest) found, its score, the number of
+        positions searched and the depth of the deepest search finished.
+        """
+        depth = depth or self.MAX_DEPTH
+        if time_limit is not None:
+            self.deadline = time.time() + time_limit
+
+        best, score, nodes, searched = None, 0, 0, 0
+        try:
+            for plies in range(1, depth + 1):
+                best, score = self.best_move(game, plies)
+                nodes += self.nodes
+                searched = plies
+                if abs(score) >= self.WIN:
+                    break
+        except OutOfTime:
+            nodes += self.nodes
+        finally:
+            self.deadline = None
+
+        if best is None:
+            # Out of time before even a one ply search finished.
+            moves = self.ordered_moves(game)
+            if moves:
+                best = moves[0]
+        return best, score, nodes, searched
 
     def move(self, board, dugout):
-        pass
+        game = Game.from_board(board, dugout, self)
+
+        if self.book is not None:
+            move = self.book.move(game)
+            if move is not None:
+                return move
+
+        if self.time_limit is None:
+            best, score = self.best_move(game, self.depth)
+        else:
+            best, score, nodes, searched = self.think(game, self.depth,
+                                                      self.time_limit)
+
+        if best is None:
+            raise Forfeit()
+        return best
 
 
-def get_available_moves(board, dugout, player):
+def get_available_moves(board, dugout, player, threats=None):
+    """
+    Generate the legal moves for a player as (dest, piece) tuples.
+
+    If the game's ThreatIndex is given, pieces from the dugout only cover
+    pieces that are part of an opponent's three-in-a-row, as in the
+    official rules. Pieces of the same size on top of different dugout
+    stacks make the same moves, so only one of them is used.
+    """
+    if threats is not None:
+        opponent = threats.opponent(player)
+
+    sizes = set()
     for piece in dugout.available:
+        if piece.size.value in sizes:
+            continue
+        sizes.add(piece.size.value)
+
         for key, cell in board:
-            if cell.pieces and cell.pieces.top().size < piece.size:
-                yield key, piece
-            elif not cell.pieces:
+            if not cell:
                 yield key, piece
+            elif cell.top().size < piece.size:
+                if threats is None or threats.in_three(key, opponent):
+                    yield key, piece
 
-    for a, b in itertools.permutations(iter(board), 2):
-        _, cell_a = a
-        dest, cell_b = b
+    for source, cell_a in board:
+        if not cell_a or cell_a.top().player is not player:
+            continue
 
-        try:
-            piece = cell_a.top()
-            if piece.player is not player:
+        piece = cell_a.top()
+        for dest, cell_b in board:
+            if dest == source:
                 continue
 
             if cell_b and cell_b.top().size >= piece.size:
                 continue
 
             yield dest, piece
-                    
-        except IndexError:
-            pass
 
 
-def random_player_game():
+def random_player_game(max_turns=1000, observer=None):
     white = RandomPlayer('white')
     black = RandomPlayer('black')
     game = Game(white, black)
-    turn_count = 0
-    while True:
-        game.tick()
-        turn_count += 1
-        #if turn_count % 10 == 0:
-        if True:
-            print 'turn count: {}'.format(turn_count)
+    if observer is not None:
+        game.add_observer(observer)
+    return game.play(max_turns)
 
 
 if __name__ == '__main__':
-    white = RandomPlayer('white')
-    black = RandomPlayer('black')
-    game = Game(white, black)
-    
-    for move in get_available_moves(game.board, game.white_dugout, white):
-        print move
+    import sys
+    from events import JSONSink
+
+    # Log a game between random players to stdout.
+    with JSONSink(sys.stdout) as sink:
+        random_player_game(observer=sink)
 
 # Rough math for calculating number of possibilities in a game
 # no idea if this is correct/complete, probably not
@@ -457,7 +1552,8 @@ if __name__ == '__main__':
 #   the internals of the game, such as the board or opponents data structures.
 #   it's not a big deal since no one is actually using this code besides me
 #   but it would be nice to make this code complete by sandboxing the player's
-#   access.
+#   access. engine.EnginePlayer and sandbox.SandboxedPlayer run players in
+#   other processes, which only ever see a copy of the position.
 # - there's probably room for improvement of the player API. something like,
 #   `dugout[0].pop().move_to(board.cell)`, I don't know.
 #   Something with move_to()
@@ -0,0 +1,293 @@
+"""
+Compact notations for Gobblet positions: a short text form, for reading
+and writing by hand, and a fixed size binary form, for storing lots of
+positions. Both cover every piece in every stack, the dugouts and whose
+turn it is, and convert to and from gobblet.Position (and through it,
+a Game).
+
+Text
+----
+
+Modelled on chess's FEN. The board rows are listed from the top, split
+by "/". Within a row, each piece is a letter for its size: "a" for the
+extra small size up to "d" for extra large, upper case for white and
+lower case for black. A run of empty cells is a digit, and a cell with
+more than one piece lists them from the bottom up in parentheses. After
+the board come white's and black's dugout stack heights, the player to
+move ("w" or "b") and the sizes in play. The start of a standard game is
+
+    4/4/4/4 444 444 w abcd
+
+and a cell holding white's small piece under black's extra large piece
+is written "(Bd)".
+
+Moves name cells by column letter and row number, "a1" being the cell
+at row 0, column 0. A piece played from the dugout is written with its
+size, as in "D@b3", and a piece moved on the board by its cells, as in
+"b3-c4".
+
+Binary
+------
+
+One byte per cell, two bits per piece size (0 for none, 1 for white,
+2 for black, lowest size in the lowest bits), in row order; then one
+byte per dugout stack, white's then black's; then one byte for the
+player to move. The length depends only on the variant: 23 bytes for
+the standard game.
+"""
+from gobblet import Move, Position, Sizes, Variant
+
+
+class NotationError(Exception): pass
+
+
+LETTERS = 'abcd'
+SIZES = dict((size.value, size) for size in Sizes.all)
+SIDES = 'wb'
+
+
+def _cell_text(cell):
+    letters = ''.join(
+        LETTERS[size].upper() if player == 0 else LETTERS[size]
+        for player, size in cell)
+    if len(cell) > 1:
+        letters = '(' + letters + ')'
+    return letters
+
+
+def _cell_byte(cell):
+    byte = 0
+    for player, size in cell:
+        byte |= (player + 1) << (size * 2)
+    return byte
+
+
+def _byte_cell(byte):
+    # None for bytes that aren't a cell: 3 isn't an owner.
+    cell = []
+    for size in range(4):
+        owner = (byte >> (size * 2)) & 3
+        if owner == 3:
+            return None
+        if owner:
+            cell.append((owner - 1, size))
+    return tuple(cell)
+
+
+# Cells repeat a lot, so their encodings are looked up rather than
+# worked out each time.
+_cell_texts = {(): ''}
+_cell_bytes = {}
+_byte_cells = [_byte_cell(byte) for byte in range(256)]
+
+
+def to_text(position):
+    rows = []
+    for row in position.rows:
+        text = []
+        empty = 0
+        for cell in row:
+            if not cell:
+                empty += 1
+                continue
+            if empty:
+                text.append(str(empty))
+                empty = 0
+            try:
+                text.append(_cell_texts[cell])
+            except KeyError:
+                text.append(_cell_texts.setdefault(cell, _cell_text(cell)))
+        if empty:
+            text.append(str(empty))
+        rows.append(''.join(text))
+
+    white, black = position.dugouts
+    return '{} {} {} {} {}'.format(
+        '/'.join(rows),
+        ''.join(str(height) for height in white),
+        ''.join(str(height) for height in black),
+        SIDES[position.to_move],
+        ''.join(LETTERS[size.value] for size in position.variant.sizes))
+
+
+def _parse_row(text, board_size):
+    cells = []
+    stack = None
+    for char in text:
+        if char == '(':
+            if stack is not None:
+                raise NotationError('Nested "(" in {!r}'.format(text))
+            stack = []
+        elif char == ')':
+            if not stack:
+                raise NotationError('Unexpected ")" in {!r}'.format(text))
+            cells.append(tuple(stack))
+            stack = None
+        elif char.isdigit():
+            if stack is not None:
+                raise NotationError('Digit inside a stack in {!r}'.format(text))
+            cells.extend([()] * int(char))
+        elif char.lower() in LETTERS:
+            piece = (0 if char.isupper() else 1, LETTERS.index(char.lower()))
+            if stack is None:
+                cells.append((piece,))
+            elif stack and stack[-1][1] >= piece[1]:
+                raise NotationError(
+                    'Pieces must get larger up a stack in {!r}'.format(text))
+            else:
+                stack.append(piece)
+        else:
+            raise NotationError('Unexpected {!r} in {!r}'.format(char, text))
+
+    if stack is not None or len(cells) != board_size:
+        raise NotationError('Bad row {!r}'.format(text))
+    return tuple(cells)
+
+
+def _check_pieces(rows, dugouts, variant):
+    """
+    Check that every piece on the board is of a size in play, and that
+    each player's pieces, on the board and in their dugout, are one of
+    each size per stack.
+    """
+    values = [size.value for size in variant.sizes]
+    counts = [dict((value, 0) for value in values) for side in SIDES]
+    for row in rows:
+        for cell in row:
+            for player, size in cell:
+                if size not in counts[player]:
+                    raise NotationError(
+                        'Size {!r} is not in play'.format(LETTERS[size]))
+                counts[player][size] += 1
+
+    for player, heights in enumerate(dugouts):
+        for height in heights:
+            for value in values[:height]:
+                counts[player][value] += 1
+        if any(count != variant.num_stacks
+               for count in counts[player].values()):
+            raise NotationError("{}'s pieces don't add up".format(
+                ('White', 'Black')[player]))
+
+
+def from_text(text):
+    try:
+        board, white, black, side, sizes = text.split()
+    except ValueError:
+        raise NotationError('Expected five fields in {!r}'.format(text))
+
+    rows = board.split('/')
+    try:
+        sizes = [SIZES[LETTERS.index(letter)] for letter in sizes]
+        white = tuple(int(height) for height in white)
+        black = tuple(int(height) for height in black)
+    except ValueError:
+        raise NotationError('Bad fields in {!r}'.format(text))
+
+    if side not in ('w', 'b'):
+        raise NotationError('Bad player to move in {!r}'.format(text))
+    to_move = SIDES.index(side)
+
+    if len(white) != len(black):
+        raise NotationError('Dugouts differ in size in {!r}'.format(text))
+    if any(height > len(sizes) for height in white + black):
+        raise NotationError('Dugout stack too high in {!r}'.format(text))
+
+    variant = Variant.get(len(rows), sizes, len(white))
+    rows = tuple(_parse_row(row, len(rows)) for row in rows)
+    _check_pieces(rows, (white, black), variant)
+    return Position(variant, rows, (white, black), to_move)
+
+
+def record_size(variant):
+    """The length of the binary form of positions in a variant."""
+    return variant.board_size ** 2 + variant.num_stacks * 2 + 1
+
+
+def to_bytes(position):
+    data = bytearray()
+    for row in position.rows:
+        for cell in row:
+            try:
+                data.append(_cell_bytes[cell])
+            except KeyError:
+                data.append(_cell_bytes.setdefault(cell, _cell_byte(cell)))
+
+    white, black = position.dugouts
+    data.extend(white)
+    data.extend(black)
+    data.append(position.to_move)
+    return bytes(data)
+
+
+def from_bytes(data, variant):
+    data = bytearray(data)
+    if len(data) != record_size(variant):
+        raise NotationError('Expected {} bytes, got {}'.format(
+            record_size(variant), len(data)))
+
+    size = variant.board_size
+    cells = [_byte_cells[byte] for byte in data[:size * size]]
+    if None in cells:
+        raise NotationError('Bad cell')
+    rows = tuple(tuple(cells[i:i + size]) for i in range(0, size * size, size))
+
+    stacks = variant.num_stacks
+    white = tuple(data[size * size:size * size + stacks])
+    black = tuple(data[size * size + stacks:size * size + stacks * 2])
+    if any(height > len(variant.sizes) for height in white + black):
+        raise NotationError('Dugout stack too high')
+    if data[-1] > 1:
+        raise NotationError('Bad player to move {}'.format(data[-1]))
+    _check_pieces(rows, (white, black), variant)
+    return Position(variant, rows, (white, black), data[-1])
+
+
+def game_to_text(game):
+    return to_text(Position.from_game(game))
+
+
+def game_from_text(text, white, black):
+    """Return a new Game between white and black in the written position."""
+    return from_text(text).to_game(white, black)
+
+
+def _cell_name(key):
+    row, col = key
+    return 'abcdefghi'[col] + str(row + 1)
+
+
+def _parse_cell(text):
+    if (len(text) != 2 or text[0] not in 'abcdefghi' or
+        text[1] not in '123456789'):
+        raise NotationError('Bad cell {!r}'.format(text))
+    return int(text[1]) - 1, 'abcdefghi'.index(text[0])
+
+
+def move_to_text(move):
+    if move.source is None:
+        return LETTERS[move.size].upper() + '@' + _cell_name(move.dest)
+    return _cell_name(move.source) + '-' + _cell_name(move.dest)
+
+
+def move_from_text(text, position):
+    """
+    Return the Move written as text in position. Board moves don't say
+    which piece moves, so it's read from the top of the source cell.
+    """
+    if '@' in text:
+        letter, dest = text.split('@', 1)
+        if len(letter) != 1 or letter.lower() not in LETTERS:
+            raise NotationError('Bad piece in {!r}'.format(text))
+        return Move(LETTERS.index(letter.lower()), None, _parse_cell(dest))
+
+    try:
+        source, dest = text.split('-')
+    except ValueError:
+        raise NotationError('Bad move {!r}'.format(text))
+
+    source = _parse_cell(source)
+    top = position.top(source)
+    if top is None:
+        raise NotationError('No piece to move in {!r}'.format(text))
+    return Move(top[1], source, _parse_cell(dest))
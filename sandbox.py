@@ -0,0 +1,197 @@
+"""
+Run player algorithms in worker processes of their own, so a player
+can't change the game behind its back or hold it up for ever.
+
+Game.move() hands players the game's own board and dugout. A
+SandboxedPlayer passes them on to its worker instead as the position's
+binary record (see notation), written into a buffer of memory shared
+with the worker. Only a few small numbers go through the pipe: what to
+read from the buffer, and the move that comes back. The worker rebuilds
+the position as a game of its own for the player to look at, and the
+move it returns is checked against the real game before it's played.
+The buffer is only ever written by the host, so nothing the worker does
+to it can change the game.
+
+Each move may use cpu_limit seconds of the worker's CPU time, and
+wall_limit seconds in all, for players which sleep or wait on something.
+A worker which goes over, crashes, or returns a move it can't play
+forfeits the game, and is replaced by a fresh one for the next game.
+
+Workers are forked, and the CPU time they use is read from /proc, so
+this only works fully on Linux. Elsewhere, only wall_limit is enforced.
+
+    from sandbox import SandboxedPlayer
+
+    with SandboxedPlayer(MinimaxPlayer('white', depth=3), cpu_limit=1) as white:
+        game = Game(white, black)
+        ...
+"""
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+from gobblet import Forfeit, Game, Move, Player, Position, Sizes, Variant
+import notation
+
+
+class SandboxError(Exception): pass
+
+
+# Messages through the pipe are packed by hand rather than pickled, since
+# unpickling what an untrusted worker sends could run anything.
+#
+# Requests: board size, bitmask of the piece sizes in play, number of
+# dugout stacks, and the length of the record in the buffer.
+REQUEST = struct.Struct('>BBBH')
+# Moves: piece size, source row and column (-1 for the dugout), dest
+# row and column. An empty message is a forfeit.
+MOVE = struct.Struct('>bbbbb')
+
+
+def _cpu_time(pid):
+    """The CPU time a process has used, in seconds, or None if unknown."""
+    try:
+        with open('/proc/{}/stat'.format(pid)) as f:
+            stat = f.read()
+    except IOError:
+        return None
+
+    # The process name is in parentheses and may hold spaces, so count
+    # fields from after it: utime and stime are the 14th and 15th.
+    fields = stat[stat.rindex(')') + 2:].split()
+    ticks = int(fields[11]) + int(fields[12])
+    return ticks / float(os.sysconf('SC_CLK_TCK'))
+
+
+def _worker(player, conn, buf):
+    opponent = Player('opponent')
+    while True:
+        try:
+            request = conn.recv_bytes()
+        except EOFError:
+            return
+        if not request:
+            return
+
+        board_size, size_mask, num_stacks, length = REQUEST.unpack(request)
+        sizes = [size for size in Sizes.all if size_mask & (1 << size.value)]
+        variant = Variant.get(board_size, sizes, num_stacks)
+        position = notation.from_bytes(buf[:length], variant)
+        game = position.to_game_for(player, opponent)
+
+        try:
+            piece, dest = player(game.board, game.on_deck.dugout)
+            source = game.board.find(piece) or (-1, -1)
+            reply = MOVE.pack(piece.size.value, source[0], source[1],
+                              int(dest[0]), int(dest[1]))
+        except Exception:
+            # Forfeit, or anything else going wrong in the player.
+            reply = b''
+        conn.send_bytes(reply)
+
+
+class SandboxedPlayer(Player):
+
+    """
+    Plays the moves of player, worked out in a worker process. See the
+    top of this module.
+    """
+
+    # Time between checks on the worker while waiting for its move.
+    POLL_INTERVAL = 0.01
+
+    def __init__(self, player, cpu_limit=5.0, wall_limit=None,
+                 buffer_size=1024):
+        super(SandboxedPlayer, self).__init__(player.name)
+        self.player = player
+        self.cpu_limit = cpu_limit
+        self.wall_limit = wall_limit or cpu_limit * 2
+        self.buffer_size = buffer_size
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        # An anonymous mapping is shared with the processes forked from
+        # this one.
+        self._buffer = mmap.mmap(-1, self.buffer_size)
+        self._conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker, args=(self.player, child_conn, self._buffer))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, timeout=1.0):
+        if self.process is None:
+            return
+
+        if self.process.is_alive():
+            try:
+                self._conn.send_bytes(b'')
+            except (IOError, OSError):
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+
+        self._conn.close()
+        self._buffer.close()
+        self.process = None
+
+    def _wait(self):
+        pid = self.process.pid
+        start_cpu = _cpu_time(pid)
+        deadline = time.time() + self.wall_limit
+
+        while not self._conn.poll(self.POLL_INTERVAL):
+            if not self.process.is_alive():
+                raise SandboxError('Worker exited')
+            if time.time() > deadline:
+                raise SandboxError('Worker took too long')
+            if start_cpu is not None:
+                used = _cpu_time(pid)
+                if used is not None and used - start_cpu > self.cpu_limit:
+                    raise SandboxError('Worker used too much CPU time')
+
+        try:
+            return self._conn.recv_bytes(MOVE.size)
+        except (EOFError, IOError, OSError):
+            raise SandboxError('Worker exited')
+
+    def move(self, board, dugout):
+        if self.process is None:
+            self.start()
+
+        game = Game.from_board(board, dugout, self)
+        variant = game.variant
+        data = notation.to_bytes(Position.from_game(game))
+        if len(data) > self.buffer_size:
+            raise SandboxError('Position is too big for the buffer')
+
+        self._buffer[:len(data)] = data
+        self._conn.send_bytes(REQUEST.pack(
+            variant.board_size, sum(1 << size.value for size in variant.sizes),
+            variant.num_stacks, len(data)))
+        try:
+            reply = self._wait()
+        except SandboxError:
+            self.stop()
+            raise Forfeit()
+
+        if len(reply) != MOVE.size:
+            raise Forfeit()
+        size, source_row, source_col, dest_row, dest_col = MOVE.unpack(reply)
+        source = None
+        if source_row >= 0 and source_col >= 0:
+            source = source_row, source_col
+        if dest_row < 0 or dest_col < 0:
+            raise Forfeit()
+        return game.legal_move(Move(size, source, (dest_row, dest_col)))
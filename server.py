@@ -0,0 +1,495 @@
+"""
+A server for playing many games of Gobblet at once between players
+connected over TCP or Unix sockets.
+
+Game.tick() calls each player in turn and waits for its move, which is
+fine for algorithms in the same process but wastes a thread per game
+on players elsewhere, who spend most of their time thinking. Instead,
+GameServer runs every game from one loop, polling all the connections
+at once and only touching a game when one of its players has said
+something, or has taken too long to.
+
+Protocol
+--------
+
+Everything is a line of text. A player connects and says who they are:
+
+    HELLO <name>
+
+and waits to be paired with the next player to connect. Then the server
+sends
+
+    START <side> <opponent>
+
+where side is "w" or "b", and on each of the player's turns,
+
+    TURN <position> <seconds>
+
+with the position in the text notation (see notation) and the time left
+to move. The player answers with a move in the move notation, "D@b3" or
+"b3-c4". At the end of the game, both players are sent
+
+    END <result> <reason>
+
+where result is "win", "loss" or "draw", and reason is one of "line",
+"invalid" (the loser made an invalid move), "timeout", "disconnect" or
+"plies" (the game went on too long). Anything the server can't make
+sense of is answered with
+
+    ERROR <message>
+
+Players stay connected after a game ends, and are paired up again when
+they say HELLO again.
+
+Backpressure
+------------
+
+A player who isn't reading what they're sent doesn't get read from until
+they catch up, and is dropped if they fall too far behind. Once the
+server has as many connections as it's allowed, it stops accepting new
+ones, and they wait in the listening socket's backlog.
+
+The loop uses select.poll(), so the server only runs on Unix.
+
+    python -m server --port 7777 --move-time 5
+    python -m server --unix /tmp/gobblet.sock
+"""
+import argparse
+from collections import deque, namedtuple
+import errno
+import heapq
+import os
+import select
+import socket
+import time
+
+from gobblet import Game, InvalidMove, Move, Player, Position
+import notation
+
+
+class ServerError(Exception): pass
+
+
+Result = namedtuple('Result', 'white black winner reason plies')
+
+
+class RemotePlayer(Player):
+
+    """
+    Stands in for a player on the other end of a connection. The server
+    plays their moves with Game.submit(), so this is never called.
+    """
+
+    def move(self, board, dugout):
+        raise ServerError('Remote players move by sending their move')
+
+
+class Connection(object):
+
+    # Lines longer than this are cut off, and the connection dropped.
+    MAX_LINE = 4096
+
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.inbox = b''
+        self.outbox = bytearray()
+        self.name = None
+        self.match = None
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def send_line(self, line):
+        if self.closed:
+            return
+        self.outbox.extend(line.encode('ascii') + b'\n')
+        if len(self.outbox) > self.server.max_outbox:
+            self.close()
+        else:
+            self.server._watch(self)
+
+    def handle_read(self):
+        try:
+            data = self.sock.recv(4096)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            data = b''
+
+        if not data:
+            self.close()
+            return
+
+        self.inbox += data
+        while not self.closed and b'\n' in self.inbox:
+            line, self.inbox = self.inbox.split(b'\n', 1)
+            self.server._handle_line(self, line.strip().decode('ascii',
+                                                               'replace'))
+
+        if len(self.inbox) > self.MAX_LINE:
+            self.close()
+
+    def handle_write(self):
+        try:
+            sent = self.sock.send(self.outbox)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            self.close()
+            return
+
+        del self.outbox[:sent]
+        self.server._watch(self)
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.server._drop(self)
+            self.sock.close()
+
+
+class Match(object):
+
+    def __init__(self, server, white, black):
+        self.server = server
+        self.white = white
+        self.black = black
+        self.game = Game(RemotePlayer(white.name), RemotePlayer(black.name),
+                         **server.game_options)
+        self.connections = {self.game.white.player: white,
+                            self.game.black.player: black}
+        self.plies = 0
+        self.deadline = None
+        self.finished = False
+
+    def start(self):
+        self.white.match = self.black.match = self
+        self.white.send_line('START w {}'.format(self.black.name))
+        self.black.send_line('START b {}'.format(self.white.name))
+        self._request_move()
+
+    def on_deck(self):
+        return self.connections[self.game.on_deck.player]
+
+    def opponent(self, connection):
+        return self.black if connection is self.white else self.white
+
+    def _request_move(self):
+        self.deadline = time.time() + self.server.move_time
+        self.on_deck().send_line('TURN {} {}'.format(
+            notation.game_to_text(self.game), self.server.move_time))
+        self.server._schedule(self)
+
+    def handle_move(self, connection, text):
+        if connection is not self.on_deck():
+            connection.send_line('ERROR Not your turn')
+            return
+
+        try:
+            move = notation.move_from_text(text, Position.from_game(self.game))
+            found = self.game.find_move(move)
+            if found is None:
+                raise InvalidMove('No such piece to move')
+            winner = self.game.submit(*found)
+        except (notation.NotationError, InvalidMove) as e:
+            connection.send_line('ERROR {}'.format(e))
+            self.end(self.opponent(connection), 'invalid')
+            return
+
+        self.plies += 1
+        if winner is not None:
+            self.end(self.connections[winner], 'line')
+        elif self.plies >= self.server.max_plies:
+            self.end(None, 'plies')
+        else:
+            self._request_move()
+
+    def check_time(self, now):
+        if not self.finished and now >= self.deadline:
+            self.end(self.opponent(self.on_deck()), 'timeout')
+
+    def end(self, winner, reason):
+        """End the game, won by the winner's connection, or drawn if None."""
+        if self.finished:
+            return
+        self.finished = True
+
+        for connection in (self.white, self.black):
+            if winner is None:
+                result = 'draw'
+            else:
+                result = 'win' if connection is winner else 'loss'
+            connection.match = None
+            connection.send_line('END {} {}'.format(result, reason))
+
+        self.server._finish(self, Result(
+            self.white.name, self.black.name,
+            winner.name if winner is not None else None,
+            reason, self.plies))
+
+
+class GameServer(object):
+
+    """
+    Listens on address, a (host, port) tuple for TCP or a path for a Unix
+    socket, and pairs up the players who connect to play each other.
+
+    Each player has move_time seconds for each move, and games still
+    going after max_plies moves are drawn. game_options are passed to
+    Game(), to play a variant.
+
+    Finished games are appended to results, as Result tuples, and passed
+    to on_result if it's given.
+    """
+
+    def __init__(self, address, move_time=10.0, max_plies=200,
+                 max_connections=10000, max_outbox=64 * 1024,
+                 game_options=None, on_result=None):
+        self.address = address
+        self.move_time = move_time
+        self.max_plies = max_plies
+        self.max_connections = max_connections
+        self.max_outbox = max_outbox
+        self.game_options = game_options or {}
+        self.on_result = on_result
+
+        self.connections = {}
+        self.lobby = deque()
+        self.matches = set()
+        self.results = []
+
+        # (deadline, count, match), soonest first. Entries for moves that
+        # have since been made are skipped when they come up.
+        self._deadlines = []
+        self._count = 0
+
+        self._poll = select.poll()
+        self._listener = None
+        self._accepting = False
+
+    def listen(self, backlog=128):
+        if isinstance(self.address, tuple):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if os.path.exists(self.address):
+                os.unlink(self.address)
+
+        sock.bind(self.address)
+        sock.listen(backlog)
+        sock.setblocking(False)
+        self._listener = sock
+        # For TCP with port 0, the port actually bound.
+        self.address = sock.getsockname()
+        self._set_accepting(True)
+        return self.address
+
+    def _set_accepting(self, accepting):
+        if accepting != self._accepting:
+            self._accepting = accepting
+            if accepting:
+                self._poll.register(self._listener, select.POLLIN)
+            else:
+                self._poll.unregister(self._listener)
+
+    def _accept(self):
+        try:
+            sock, address = self._listener.accept()
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            raise
+
+        sock.setblocking(False)
+        connection = Connection(self, sock)
+        self.connections[connection.fileno()] = connection
+        self._watch(connection)
+
+        if len(self.connections) >= self.max_connections:
+            self._set_accepting(False)
+
+    def _watch(self, connection):
+        # Only read from connections which are keeping up with what
+        # they're sent, and only ask to write when there's something
+        # to write.
+        if connection.closed:
+            return
+        events = 0
+        if len(connection.outbox) < self.max_outbox // 2:
+            events |= select.POLLIN
+        if connection.outbox:
+            events |= select.POLLOUT
+        self._poll.register(connection.fileno(), events)
+
+    def _drop(self, connection):
+        del self.connections[connection.fileno()]
+        self._poll.unregister(connection.fileno())
+
+        if connection in self.lobby:
+            self.lobby.remove(connection)
+        if connection.match is not None:
+            match = connection.match
+            match.end(match.opponent(connection), 'disconnect')
+
+        if self._listener is not None:
+            self._set_accepting(len(self.connections) < self.max_connections)
+
+    def _handle_line(self, connection, line):
+        if not line:
+            return
+
+        if connection.match is not None:
+            connection.match.handle_move(connection, line)
+            return
+
+        command, _, name = line.partition(' ')
+        if command != 'HELLO' or not name.strip():
+            connection.send_line('ERROR Expected HELLO <name>')
+            return
+
+        connection.name = name.strip()
+        if connection not in self.lobby:
+            self.lobby.append(connection)
+        self._pair()
+
+    def _pair(self):
+        while len(self.lobby) >= 2:
+            match = Match(self, self.lobby.popleft(), self.lobby.popleft())
+            self.matches.add(match)
+            match.start()
+
+    def _schedule(self, match):
+        self._count += 1
+        heapq.heappush(self._deadlines, (match.deadline, self._count, match))
+
+    def _finish(self, match, result):
+        self.matches.discard(match)
+        self.results.append(result)
+        if self.on_result is not None:
+            self.on_result(result)
+
+    def _check_deadlines(self):
+        now = time.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, count, match = heapq.heappop(self._deadlines)
+            if deadline == match.deadline:
+                match.check_time(now)
+
+    def serve_once(self, timeout=None):
+        """
+        Wait up to timeout seconds (forever if None) for something to
+        happen, and deal with it.
+        """
+        if self._deadlines:
+            until = max(0, self._deadlines[0][0] - time.time())
+            timeout = until if timeout is None else min(timeout, until)
+
+        try:
+            events = self._poll.poll(None if timeout is None
+                                     else int(timeout * 1000) + 1)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            events = []
+
+        for fd, event in events:
+            if self._listener is not None and fd == self._listener.fileno():
+                self._accept()
+                continue
+
+            connection = self.connections.get(fd)
+            if connection is None:
+                continue
+            if event & select.POLLOUT:
+                connection.handle_write()
+            if event & (select.POLLIN | select.POLLHUP | select.POLLERR):
+                if not connection.closed:
+                    connection.handle_read()
+
+        self._check_deadlines()
+
+    def serve_forever(self):
+        while True:
+            self.serve_once()
+
+    def close(self):
+        for connection in list(self.connections.values()):
+            connection.close()
+        if self._listener is not None:
+            self._set_accepting(False)
+            self._listener.close()
+            if not isinstance(self.address, tuple):
+                os.unlink(self.address)
+            self._listener = None
+
+
+def play_remote(address, player, name=None):
+    """
+    Connect to a server and play one game with a local player algorithm,
+    e.g. a MinimaxPlayer. Returns the result and reason from the END line.
+    """
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+
+    f = sock.makefile('rwb')
+    try:
+        f.write('HELLO {}\n'.format(name or player.name).encode('ascii'))
+        f.flush()
+
+        side = opponent = None
+        for line in f:
+            fields = line.decode('ascii').split()
+            if not fields:
+                continue
+
+            if fields[0] == 'START':
+                side, opponent = fields[1], Player(fields[2])
+            elif fields[0] == 'TURN':
+                text = ' '.join(fields[1:-1])
+                if side == 'w':
+                    game = notation.game_from_text(text, player, opponent)
+                else:
+                    game = notation.game_from_text(text, opponent, player)
+
+                piece, dest = player(game.board, game.on_deck.dugout)
+                move = notation.move_to_text(Move(
+                    piece.size.value, game.board.find(piece), dest))
+                f.write(move.encode('ascii') + b'\n')
+                f.flush()
+            elif fields[0] == 'END':
+                return fields[1], fields[2]
+    finally:
+        f.close()
+        sock.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gobblet game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7777)
+    parser.add_argument('--unix', default=None, help='Unix socket path')
+    parser.add_argument('--move-time', type=float, default=10.0)
+    parser.add_argument('--max-plies', type=int, default=200)
+    parser.add_argument('--max-connections', type=int, default=10000)
+
+    args = parser.parse_args()
+    address = args.unix or (args.host, args.port)
+
+    def report(result):
+        print('{} v {}: {} ({}, {} plies)'.format(
+            result.white, result.black, result.winner or 'draw',
+            result.reason, result.plies))
+
+    server = GameServer(address, args.move_time, args.max_plies,
+                        args.max_connections, on_result=report)
+    print('Listening on {}'.format(server.listen()))
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
@@ -0,0 +1,344 @@
+"""
+Endgame tablebases for Gobblet, by retrograde analysis.
+
+solve() walks every position reachable from a starting position and
+works out which are won, lost or drawn for the player to move, and how
+many plies it takes to win (or to lose, playing as long as possible).
+It starts from the positions where the player to move can win at once,
+or can't avoid losing at once, and works backwards from there through
+the positions leading to them. Positions never reached that way are
+draws: neither player can force the game to end.
+
+That's only practical for small games: smaller boards, fewer piece
+sizes or fewer dugout stacks (see gobblet.Variant), or
+a 4x4 game late enough that little material is left to move around.
+
+The results are written to a file of sorted position codes followed by
+the results, each packed into just as many bits as it needs. Tablebase
+memory-maps the file and finds positions with a binary search.
+
+To solve a 3x3 game with two piece sizes and one stack each:
+
+    python -m tablebase build jr.tb --board-size 3 --sizes 2 --stacks 1
+"""
+import argparse
+import binascii
+from collections import deque
+import mmap
+import struct
+
+from gobblet import (Board, Dugout, Game, Piece, Player, Sizes, Variant,
+                     board_symmetries, remaining_stacks)
+
+
+MAGIC = b'GTB1'
+
+# Magic, board size, bitmask of the piece sizes in play, number of
+# dugout stacks, bytes per position code, bits per result, number of
+# positions.
+HEADER = struct.Struct('>4sBBBBBI')
+
+# Results, for the player to move.
+DRAW, WIN, LOSS = 0, 1, 2
+
+
+class TablebaseError(Exception): pass
+
+
+class PositionCoder(object):
+
+    """
+    Turns positions into integers and back, for one configuration of
+    board size, piece sizes and dugout stacks.
+
+    Each cell is a number in base 3, with a digit per piece size: 0 if
+    no piece of that size is in the cell, 1 if the player to move has
+    one there, 2 if the opponent does. The position is then a number
+    with a digit per cell, in base 3 ** (number of sizes). Of the
+    numbers for the eight symmetries of the board, the smallest is used.
+
+    Unlike gobblet.position_hash(), codes never collide, which matters
+    when every position's result has to be exact.
+    """
+
+    def __init__(self, variant):
+        board_size = variant.board_size
+        self.variant = variant
+        self.board_size = board_size
+        self.sizes = variant.sizes
+        self.num_stacks = variant.num_stacks
+
+        self.digits = dict((size.value, 3 ** i)
+                           for i, size in enumerate(self.sizes))
+        self.base = 3 ** len(self.sizes)
+
+        self.keys = [(row, col) for row in range(board_size)
+                     for col in range(board_size)]
+        places = dict((key, self.base ** i)
+                      for i, key in enumerate(self.keys))
+        self.places = [dict((key, places[to]) for key, to in symmetry.items())
+                       for symmetry in board_symmetries(board_size)]
+
+        largest = self.base ** len(self.keys) - 1
+        self.key_bytes = (len('{:x}'.format(largest)) + 1) // 2
+
+    def matches(self, game):
+        return game.variant is self.variant
+
+    def encode(self, game):
+        mover = game.on_deck.player
+        cells = []
+        for key, cell in game.board:
+            if cell:
+                digits = 0
+                for piece in cell.pieces:
+                    owner = 1 if piece.player is mover else 2
+                    digits += owner * self.digits[piece.size.value]
+                cells.append((key, digits))
+
+        return min(sum(digits * places[key] for key, digits in cells)
+                   for places in self.places)
+
+    def decode(self, code):
+        """Return a game in the coded position, with the mover on deck."""
+        mover = Player('mover')
+        opponent = Player('opponent')
+
+        board = Board(self.board_size)
+        for key in self.keys:
+            code, digits = divmod(code, self.base)
+            for size in self.sizes:
+                digits, owner = divmod(digits, 3)
+                if owner:
+                    player = mover if owner == 1 else opponent
+                    board[key].push(Piece(player, size))
+
+        stacks = remaining_stacks(board, mover, self.sizes, self.num_stacks)
+        return Game.from_board(board, Dugout(stacks), mover)
+
+    def to_bytes(self, code):
+        return binascii.unhexlify('{:0{}x}'.format(code, self.key_bytes * 2))
+
+
+def solve(root, max_positions=None):
+    """
+    Solve every position reachable from the root game. Returns a dict
+    of {position code: (result, distance)}, where distance is the number
+    of plies until the game ends (0 for draws).
+
+    Raises TablebaseError if there are more than max_positions.
+    """
+    coder = PositionCoder(root.variant)
+
+    codes = [coder.encode(root)]
+    index = {codes[0]: 0}
+    children = []
+    wins_now = []
+    num_moves = []
+
+    # Walk forward, numbering every position and noting which positions
+    # each one leads to.
+    i = 0
+    while i < len(codes):
+        game = coder.decode(codes[i])
+        player = game.on_deck.player
+        moves = game.available_moves()
+
+        kids = set()
+        win_now = False
+        for piece, dest in moves:
+            token, winner = game._apply(piece, dest)
+            if winner is None:
+                child = coder.encode(game)
+                if child not in index:
+                    if max_positions and len(codes) >= max_positions:
+                        raise TablebaseError(
+                            'More than {} positions'.format(max_positions))
+                    index[child] = len(codes)
+                    codes.append(child)
+                kids.add(index[child])
+            elif winner is player:
+                win_now = True
+            game._undo(token)
+
+        children.append(kids)
+        wins_now.append(win_now)
+        num_moves.append(len(moves))
+        i += 1
+
+    parents = [[] for _ in codes]
+    for parent, kids in enumerate(children):
+        for child in kids:
+            parents[child].append(parent)
+
+    results = [DRAW] * len(codes)
+    distances = [0] * len(codes)
+    # Number of moves not yet known to lose, for each position.
+    unresolved = [len(kids) for kids in children]
+
+    queue = deque()
+    for i in range(len(codes)):
+        if wins_now[i]:
+            results[i], distances[i] = WIN, 1
+            queue.append(i)
+        elif num_moves[i] and not children[i]:
+            # Every move reveals an opponent's line.
+            results[i], distances[i] = LOSS, 1
+            queue.append(i)
+
+    # Work backwards. Positions come off the queue in order of distance,
+    # so a win is found by its quickest route and a loss is only decided
+    # by its slowest.
+    while queue:
+        child = queue.popleft()
+        for parent in parents[child]:
+            if results[parent] != DRAW:
+                continue
+
+            if results[child] == LOSS:
+                results[parent] = WIN
+                distances[parent] = distances[child] + 1
+                queue.append(parent)
+            else:
+                unresolved[parent] -= 1
+                if unresolved[parent] == 0 and not wins_now[parent]:
+                    results[parent] = LOSS
+                    distances[parent] = distances[child] + 1
+                    queue.append(parent)
+
+    return dict((code, (results[i], distances[i]))
+                for i, code in enumerate(codes))
+
+
+def write_tablebase(path, coder, table):
+    """Write a table from solve() to a tablebase file."""
+    max_distance = max([distance for result, distance in table.values()] + [1])
+    distance_bits = len(bin(max_distance)) - 2
+    bits = 2 + distance_bits
+    if bits + 7 > 32:
+        raise TablebaseError('Distances are too long to pack')
+
+    codes = sorted(table)
+
+    # The results are packed end to end, least significant bit first,
+    # with room at the end to read a whole 32 bit word for the last one.
+    packed = bytearray((len(codes) * bits + 7) // 8 + 4)
+    for i, code in enumerate(codes):
+        result, distance = table[code]
+        byte, shift = divmod(i * bits, 8)
+        word = struct.unpack_from('<I', packed, byte)[0]
+        word |= ((result << distance_bits) | distance) << shift
+        struct.pack_into('<I', packed, byte, word)
+
+    size_mask = sum(1 << size.value for size in coder.sizes)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, coder.board_size, size_mask,
+                            coder.num_stacks, coder.key_bytes, bits,
+                            len(codes)))
+        for code in codes:
+            f.write(coder.to_bytes(code))
+        f.write(packed)
+
+
+def build_tablebase(path, root, max_positions=None):
+    """Solve the positions reachable from the root game and save them."""
+    coder = PositionCoder(root.variant)
+    table = solve(root, max_positions)
+    write_tablebase(path, coder, table)
+    return table
+
+
+class Tablebase(object):
+
+    """
+    Read-only view of a tablebase file. Use as a context manager, or call
+    close() when done.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, board_size, size_mask, num_stacks, self.key_bytes, \
+            self.bits, self.count = HEADER.unpack_from(self._map, 0)
+
+        if magic != MAGIC:
+            self.close()
+            raise TablebaseError('{} is not a tablebase'.format(path))
+
+        sizes = [size for size in Sizes.all if size_mask & (1 << size.value)]
+        self.coder = PositionCoder(Variant.get(board_size, sizes, num_stacks))
+
+        self._values = HEADER.size + self.count * self.key_bytes
+        self._distance_bits = self.bits - 2
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _key(self, i):
+        start = HEADER.size + i * self.key_bytes
+        return self._map[start:start + self.key_bytes]
+
+    def _value(self, i):
+        byte, shift = divmod(i * self.bits, 8)
+        word = struct.unpack_from('<I', self._map, self._values + byte)[0]
+        value = (word >> shift) & ((1 << self.bits) - 1)
+        return value >> self._distance_bits, \
+            value & ((1 << self._distance_bits) - 1)
+
+    def find(self, code):
+        """Return (result, distance) for a position code, or None."""
+        key = self.coder.to_bytes(code)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._key(mid)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                return self._value(mid)
+
+    def probe(self, game):
+        """
+        Return (result, distance) for the player on deck, or None if the
+        position isn't in the table.
+        """
+        if not self.coder.matches(game):
+            return None
+        return self.find(self.coder.encode(game))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gobblet tablebases')
+    commands = parser.add_subparsers(dest='command')
+
+    build = commands.add_parser('build', help='solve a small variant')
+    build.add_argument('path')
+    build.add_argument('--board-size', type=int, default=3)
+    build.add_argument('--sizes', type=int, default=2)
+    build.add_argument('--stacks', type=int, default=1)
+    build.add_argument('--max-positions', type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == 'build':
+        root = Game(Player('white'), Player('black'),
+                    board_size=args.board_size,
+                    sizes=Sizes.all[-args.sizes:],
+                    num_stacks=args.stacks)
+        table = build_tablebase(args.path, root, args.max_positions)
+        wins = sum(1 for result, _ in table.values() if result == WIN)
+        losses = sum(1 for result, _ in table.values() if result == LOSS)
+        print('{} positions written to {} ({} won, {} lost)'.format(
+            len(table), args.path, wins, losses))
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import analysis
+import notation
+
+
+START = '4/4/4/4 444 444 w abcd'
+# White can win at once by finishing the top row.
+WIN_NOW = 'DDD1/4/4/ddd1 333 333 w abcd'
+
+
+class AnalysisTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, lines):
+        path = os.path.join(self.dir, 'positions.txt')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_read_positions(self):
+        path = self.write(['# comment', START, '', WIN_NOW])
+        positions = list(analysis.read_positions(path))
+        self.assertEqual([notation.to_text(p) for p in positions],
+                         [START, WIN_NOW])
+
+    def test_read_binary_positions(self):
+        positions = [notation.from_text(START), notation.from_text(WIN_NOW)]
+        path = os.path.join(self.dir, 'positions.bin')
+        with open(path, 'wb') as f:
+            for position in positions:
+                f.write(notation.to_bytes(position))
+
+        variant = positions[0].variant
+        self.assertEqual(list(analysis.read_positions(path, variant)),
+                         positions)
+
+    def test_finds_win_in_process(self):
+        position = notation.from_text(WIN_NOW)
+        result, = analysis.analyse([position], depth=2, processes=0)
+
+        self.assertEqual(result.position, position)
+        self.assertEqual(result.move.dest, (0, 3))
+        self.assertGreaterEqual(result.score, 1000000)
+        self.assertGreater(result.nodes, 0)
+
+    def test_pool_keeps_order(self):
+        texts = [START, WIN_NOW] * 3
+        positions = [notation.from_text(text) for text in texts]
+        results = list(analysis.analyse(positions, depth=1, processes=2))
+
+        self.assertEqual([r.position for r in results], positions)
+        for result in results[1::2]:
+            self.assertEqual(result.move.dest, (0, 3))
+
+    def test_reads_positions_lazily(self):
+        read = []
+
+        def positions():
+            for i in range(100):
+                read.append(i)
+                yield notation.from_text(START)
+
+        results = analysis.analyse(positions(), depth=1, processes=2,
+                                   window=2)
+        next(results)
+        # Two chunks of one for each of the two workers.
+        self.assertEqual(len(read), 4)
+        results.close()
+
+    def test_needs_a_limit(self):
+        with self.assertRaises(ValueError):
+            list(analysis.analyse([], processes=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+from StringIO import StringIO
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock, patch
+
+import gobblet
+import bench
+
+
+class DeepSizeofTestCase(unittest.TestCase):
+
+    def test_counts_contents(self):
+        self.assertGreater(bench.deep_sizeof([[1, 2, 3], 'abc']),
+                           bench.deep_sizeof([[], '']))
+
+    def test_counts_once(self):
+        item = list(range(100))
+        self.assertLess(bench.deep_sizeof([item, item]),
+                        bench.deep_sizeof([item, list(range(100))]))
+
+    def test_skips_shared(self):
+        white = gobblet.Player('white' * 1000)
+        piece = gobblet.Piece(white, gobblet.Sizes.xl)
+        other = gobblet.Piece(gobblet.Player('w'), gobblet.Sizes.xl)
+        self.assertEqual(bench.deep_sizeof(piece), bench.deep_sizeof(other))
+
+    def test_slots(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        position = gobblet.Position.from_game(game)
+        self.assertGreater(bench.deep_sizeof(position),
+                           bench.deep_sizeof(position.rows))
+
+    def test_structures_grow(self):
+        empty = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        self.assertGreater(bench.deep_sizeof(bench.midgame().board),
+                           bench.deep_sizeof(empty.board))
+
+
+class MemoryBenchmarkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_measure(self):
+        results, method = bench.measure_memory(search_depth=2)
+        self.assertEqual(set(results), set([
+            'board', 'dugout', 'game', 'position', 'position_text',
+            'position_binary', 'game_position', 'table_entry', 'peak_game',
+            'peak_search']))
+        self.assertEqual(results['position_binary'], 23)
+        self.assertLess(results['game_position'], results['position'])
+        self.assertIn(method, ('tracemalloc', 'deep_sizeof'))
+        self.assertGreater(results['peak_game'], results['game'])
+        self.assertGreater(results['peak_search'], results['table_entry'])
+
+    @unittest.skipIf(bench.tracemalloc is None, 'needs tracemalloc')
+    def test_peak_memory(self):
+        self.assertGreater(bench.peak_memory(lambda: [0] * 1000000), 1000000)
+
+    def test_held_peaks(self):
+        game, search = bench.held_peaks(search_depth=2)
+        empty = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        self.assertGreater(game, bench.deep_sizeof(empty))
+        self.assertGreater(search, bench.deep_sizeof(empty))
+
+    def test_compare(self):
+        baseline = {'board': 1000, 'game': 1000, 'new': 0}
+        results = {'board': 1050, 'game': 1200, 'new': 10, 'other': 5}
+        self.assertEqual(bench.compare(results, baseline), ['game'])
+        self.assertEqual(bench.compare(results, baseline, 0.01),
+                         ['board', 'game'])
+
+    def test_command(self):
+        path = os.path.join(self.dir, 'baseline.json')
+        args = Mock(depth=1, save=path, baseline=None, tolerance=0.1)
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            self.assertEqual(bench._memory_command(args), 0)
+        self.assertIn('peak_search', stdout.getvalue())
+
+        with open(path) as f:
+            saved = json.load(f)
+        saved['results']['board'] = 1
+        with open(path, 'w') as f:
+            json.dump(saved, f)
+
+        args = Mock(depth=1, save=None, baseline=path, tolerance=0.1)
+        with patch('sys.stdout', new_callable=StringIO) as stdout:
+            self.assertEqual(bench._memory_command(args), 1)
+        self.assertIn('Bigger than the baseline: board', stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import book
+import gobblet
+
+
+class PositionHashTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.white = gobblet.Player('white')
+        self.black = gobblet.Player('black')
+
+    def board_with(self, pieces):
+        board = gobblet.Board(4)
+        for key, player, size in pieces:
+            board[key].push(gobblet.Piece(player, size))
+        return board
+
+    def test_symmetric_positions_hash_the_same(self):
+        xl = gobblet.Sizes.xl
+        a = self.board_with([((0, 1), self.white, xl),
+                             ((2, 2), self.black, xl)])
+        # The same position, rotated a quarter turn.
+        b = self.board_with([((1, 3), self.white, xl),
+                             ((2, 1), self.black, xl)])
+
+        self.assertEqual(gobblet.position_hash(a, self.white)[0],
+                         gobblet.position_hash(b, self.white)[0])
+
+    def test_hash_is_relative_to_player_on_deck(self):
+        xl = gobblet.Sizes.xl
+        a = self.board_with([((0, 1), self.white, xl)])
+        b = self.board_with([((0, 1), self.black, xl)])
+
+        self.assertEqual(gobblet.position_hash(a, self.white)[0],
+                         gobblet.position_hash(b, self.black)[0])
+        self.assertNotEqual(gobblet.position_hash(a, self.white)[0],
+                            gobblet.position_hash(a, self.black)[0])
+
+
+class OpeningBookTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'opening.book')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_build_and_lookup(self):
+        entries = book.build_book(self.path, plies=2, depth=1)
+
+        with book.OpeningBook(self.path) as opening:
+            self.assertEqual(len(opening), len(entries))
+            for key in entries:
+                self.assertEqual(opening.find(key), entries[key])
+            self.assertEqual(opening.find(1), None)
+
+    def test_covers_every_position(self):
+        # Count the positions in the first plies breadth first, so each
+        # is found by its shortest line of play.
+        variant = gobblet.Variant.get(3, gobblet.Sizes.all[2:], 2)
+        white = gobblet.Player('white')
+        black = gobblet.Player('black')
+        plies = 5
+
+        def key(position):
+            game = position.to_game(white, black)
+            return gobblet.position_hash(game.board, game.on_deck.player)[0]
+
+        start = gobblet.Position.initial(variant)
+        seen = set()
+        level = {key(start): start}
+        for ply in range(plies):
+            seen.update(level)
+            following = {}
+            for position in level.values():
+                for move in position.moves():
+                    after = position.play(move)
+                    if after.winner is None and key(after) not in seen:
+                        following[key(after)] = after
+            level = following
+
+        game = start.to_game(white, black)
+        entries = {}
+        book.search_positions(game, plies,
+                              gobblet.MinimaxPlayer('book', depth=1), entries)
+        self.assertEqual(set(entries), seen)
+
+    def test_move_is_translated_to_board(self):
+        book.build_book(self.path, plies=2, depth=1)
+        white = gobblet.Player('white')
+        black = gobblet.Player('black')
+
+        with book.OpeningBook(self.path) as opening:
+            # Each corner is the same position, so the book must answer
+            # with the same move, rotated to match the board.
+            answers = []
+            for corner in [(0, 0), (0, 3), (3, 3), (3, 0)]:
+                game = gobblet.Game(white, black)
+                piece = game.white.dugout.available[0]
+                game._apply(piece, corner)
+
+                piece, dest = opening.move(game)
+                self.assertIn(piece, game.black.dugout.available)
+                game._validate(black, game.black.dugout, piece, dest)
+                answers.append(dest)
+
+            self.assertEqual(len(set(answers)), 4)
+
+    def test_player_uses_book(self):
+        book.build_book(self.path, plies=1, depth=1)
+
+        with book.OpeningBook(self.path) as opening:
+            white = gobblet.MinimaxPlayer('white', depth=1, book=opening)
+            game = gobblet.Game(white, gobblet.Player('black'))
+
+            white(game.board, game.white.dugout)
+            # Answered from the book, so nothing was searched.
+            self.assertEqual(white.nodes, 0)
+
+    def test_other_variants_not_answered(self):
+        book.build_book(self.path, plies=1, depth=1)
+        white = gobblet.Player('white')
+        black = gobblet.Player('black')
+
+        with book.OpeningBook(self.path) as opening:
+            self.assertNotEqual(opening.move(gobblet.Game(white, black)),
+                                None)
+            for game in [gobblet.Game(white, black, num_stacks=2),
+                         gobblet.Game(white, black,
+                                      sizes=gobblet.Sizes.all[1:])]:
+                self.assertEqual(opening.move(game), None)
+
+    def test_not_a_book(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'\0' * 64)
+
+        with self.assertRaises(book.BookError):
+            book.OpeningBook(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
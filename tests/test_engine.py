@@ -0,0 +1,102 @@
+from StringIO import StringIO
+import sys
+import unittest
+
+import gobblet
+from gobblet import MinimaxPlayer, Player
+import engine
+
+
+# An engine which says hello and then never answers.
+SILENT = '''
+import sys
+for line in iter(sys.stdin.readline, ''):
+    if line.strip() == 'gobblet':
+        sys.stdout.write('id name silent\\ngobbletok\\n')
+        sys.stdout.flush()
+'''
+
+# An engine which answers every position with a move off the board.
+OFF_BOARD = '''
+import sys
+for line in iter(sys.stdin.readline, ''):
+    if line.strip() == 'gobblet':
+        sys.stdout.write('id name off board\\ngobbletok\\n')
+    elif line.startswith('go'):
+        sys.stdout.write('bestmove D@i9\\n')
+    sys.stdout.flush()
+'''
+
+
+class RunEngineTestCase(unittest.TestCase):
+
+    def run_engine(self, player, commands):
+        stdout = StringIO()
+        engine.run_engine(player, StringIO('\n'.join(commands) + '\n'),
+                          stdout)
+        return stdout.getvalue().splitlines()
+
+    def test_handshake(self):
+        lines = self.run_engine(MinimaxPlayer('minimax'),
+                                ['gobblet', 'isready', 'quit', 'isready'])
+        self.assertEqual(lines, ['id name minimax', 'gobbletok', 'readyok'])
+
+    def test_takes_win(self):
+        lines = self.run_engine(MinimaxPlayer('minimax'), [
+            'position 4/DDD1/4/ddd1 333 333 w abcd',
+            'go depth 2',
+        ])
+        self.assertTrue(lines[0].startswith('info depth 1 score 1000001'))
+        self.assertEqual(lines[1], 'bestmove C@d2')
+
+    def test_plays_black(self):
+        lines = self.run_engine(MinimaxPlayer('minimax'), [
+            'position D3/4/4/4 443 444 b abcd',
+            'go movetime 100',
+        ])
+        self.assertTrue(lines[-1].startswith('bestmove D@'))
+        # The depth searched in the time, not the depth asked for.
+        self.assertRegexpMatches(lines[0], r'^info depth [1-9]')
+
+    def test_no_position(self):
+        lines = self.run_engine(MinimaxPlayer('minimax'),
+                                ['position nonsense', 'go depth 1'])
+        self.assertEqual(lines, ['bestmove none'])
+
+
+class EnginePlayerTestCase(unittest.TestCase):
+
+    def test_game(self):
+        with engine.EnginePlayer('engine', move_time=0.2) as white:
+            self.assertEqual(white.engine_name, 'minimax')
+            white.is_ready()
+
+            game = gobblet.Game(white, MinimaxPlayer('minimax', depth=1))
+            for ply in range(40):
+                winner = game.tick()
+                if winner is not None:
+                    break
+
+            # The engine's process is still the one it started with.
+            self.assertEqual(white.process.poll(), None)
+
+    def test_silent_engine_forfeits(self):
+        command = [sys.executable, '-c', SILENT]
+        with engine.EnginePlayer('silent', command, move_time=0.1) as white:
+            white.GRACE = 0.1
+            game = gobblet.Game(white, Player('black'))
+            self.assertEqual(game.tick(), game.black.player)
+
+    def test_illegal_move_forfeits(self):
+        command = [sys.executable, '-c', OFF_BOARD]
+        with engine.EnginePlayer('off', command, move_time=0.1) as white:
+            game = gobblet.Game(white, Player('black'))
+            self.assertEqual(game.tick(), game.black.player)
+
+    def test_engine_which_exits(self):
+        with self.assertRaises(engine.EngineError):
+            engine.EnginePlayer('broken', [sys.executable, '-c', 'pass'])
+
+
+if __name__ == '__main__':
+    unittest.main()
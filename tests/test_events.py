@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+
+import gobblet
+from gobblet import Events, MinimaxPlayer, Move
+import events
+
+
+class GameEventsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.white = MinimaxPlayer('white', depth=1)
+        self.black = MinimaxPlayer('black', depth=1)
+        self.game = gobblet.Game(self.white, self.black)
+        self.game.add_observer(self.events.append)
+
+    def test_moves_and_win(self):
+        winner = self.game.play()
+
+        kinds = [event.kind for event in self.events]
+        self.assertEqual(kinds[-1], Events.win)
+        self.assertEqual(set(kinds[:-1]), set([Events.move]))
+        self.assertIs(self.events[-1].player, winner)
+        self.assertEqual([event.turn for event in self.events[:-1]],
+                         list(range(len(self.events) - 1)))
+        self.assertEqual(self.events[0].move, Move(3, None, (0, 0)))
+
+    def test_draw(self):
+        self.assertEqual(self.game.play(max_turns=2), None)
+        self.assertEqual([event.kind for event in self.events],
+                         [Events.move, Events.move, Events.draw])
+
+    def test_forfeit(self):
+        black = Mock(side_effect=gobblet.Forfeit())
+        game = gobblet.Game(self.white, black)
+        game.add_observer(self.events.append)
+        game.tick()
+        game.tick()
+
+        self.assertEqual(self.events[-1].kind, Events.forfeit)
+        self.assertIs(self.events[-1].player, black)
+
+    def test_invalid(self):
+        game = gobblet.Game(Mock(return_value=(None, (0, 0))), self.black)
+        game.add_observer(self.events.append)
+        with self.assertRaises(gobblet.InvalidMove):
+            game.tick()
+
+        event, = self.events
+        self.assertEqual(event.kind, Events.invalid)
+        self.assertEqual(event.reason, 'Must provide a source piece')
+
+    def test_remove_observer(self):
+        self.game.remove_observer(self.events.append)
+        self.game.tick()
+        self.assertEqual(self.events, [])
+
+
+class SinkTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'events')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def play(self, sink, max_turns=None):
+        game = gobblet.Game(MinimaxPlayer('white', depth=1),
+                            MinimaxPlayer('black', depth=1))
+        game.add_observer(sink)
+        game.play(max_turns)
+        return game
+
+    def read_json(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_json(self):
+        with events.JSONSink(self.path) as sink:
+            self.play(sink)
+
+        records = self.read_json()
+        self.assertEqual(records[0], {'event': 'move', 'turn': 0,
+                                      'player': 'white', 'move': 'D@a1'})
+        self.assertEqual(records[-1]['event'], 'win')
+
+    def test_batches(self):
+        sink = events.JSONSink(self.path, batch_size=4)
+        self.play(sink, max_turns=3)
+        # Three moves and a draw make a batch.
+        self.assertEqual(len(self.read_json()), 4)
+
+        self.play(sink, max_turns=1)
+        self.assertEqual(len(self.read_json()), 4)
+        sink.close()
+        self.assertEqual(len(self.read_json()), 6)
+
+    def test_sampling(self):
+        with events.JSONSink(self.path, sample=0.0) as sink:
+            self.play(sink, max_turns=10)
+            self.play(sink)
+
+        self.assertEqual([record['event'] for record in self.read_json()],
+                         ['draw', 'win'])
+
+    def test_binary(self):
+        with events.BinarySink(self.path) as sink:
+            game = self.play(sink)
+
+        records = list(events.read_binary(self.path, game.variant))
+        self.assertEqual(records[0].kind, Events.move)
+        self.assertEqual(records[0].side, 0)
+        self.assertEqual(records[0].move, Move(3, None, (0, 0)))
+        self.assertEqual(records[0].position[0, 0], ((0, 3),))
+
+        self.assertEqual(records[-1].kind, Events.win)
+        self.assertEqual(records[-1].move, None)
+        self.assertEqual(records[-1].position,
+                         gobblet.Position.from_game(game))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import unittest
 from mock import Mock
 
 import gobblet
+import notation
 
 
 class GameTestCase(unittest.TestCase):
@@ -160,7 +161,8 @@ class GameTestCase(unittest.TestCase):
         board[0, 0].push(white_piece)
         board[0, 1].push(white_piece)
         board[0, 2].push(white_piece)
-        board[0, 3].push(white_piece)
+        # A smaller piece, so black can cover it.
+        board[0, 3].push(gobblet.Piece(game.white.player, gobblet.Sizes.sm))
 
         # This is the important part. In this cell, black is covering
         # white's piece. When black lifts up the piece, it will
@@ -178,6 +180,53 @@ class GameTestCase(unittest.TestCase):
         self.assertEqual(cm.exception.player, game.white.player)
 
 
+class VariantTestCase(unittest.TestCase):
+
+    def test_default_variant(self):
+        game = gobblet.Game(Mock(), Mock())
+        self.assertEqual(game.board.size, 4)
+        self.assertEqual(len(game.white.dugout.stacks), 3)
+        self.assertEqual(len(game.variant.lines), 10)
+
+    def test_smaller_game(self):
+        sizes = [gobblet.Sizes.sm, gobblet.Sizes.lg, gobblet.Sizes.xl]
+        game = gobblet.Game(Mock(), Mock(), board_size=3, sizes=sizes,
+                            num_stacks=2)
+
+        self.assertEqual(game.board.size, 3)
+        self.assertEqual(len(game.white.dugout.stacks), 2)
+        self.assertEqual(len(game.white.dugout.stacks[0]), 3)
+        self.assertEqual(len(game.variant.lines), 8)
+
+        piece = game.white.dugout.available[0]
+        for col in range(3):
+            game.board[1, col].push(piece)
+        self.assertEqual(game._check_win(game.board), game.white.player)
+
+    def test_tables_are_shared(self):
+        a = gobblet.Game(Mock(), Mock(), board_size=5)
+        b = gobblet.Game(Mock(), Mock(), board_size=5)
+        c = gobblet.Game(Mock(), Mock())
+
+        self.assertIs(a.variant, b.variant)
+        self.assertIsNot(a.variant, c.variant)
+
+    def test_size_order_doesnt_matter(self):
+        sizes = list(gobblet.Sizes.all)
+        a = gobblet.Game(Mock(), Mock(), sizes=sizes)
+        b = gobblet.Game(Mock(), Mock(), sizes=sizes[::-1])
+        self.assertIs(a.variant, b.variant)
+
+    def test_from_board_keeps_variant(self):
+        player = gobblet.Player('white')
+        game = gobblet.Game(player, Mock(), board_size=3,
+                            sizes=gobblet.Sizes.all[-2:], num_stacks=2)
+
+        copied = gobblet.Game.from_board(game.board, game.white.dugout,
+                                         player)
+        self.assertIs(copied.variant, game.variant)
+
+
 class InvalidTestCase(unittest.TestCase):
     """Test cases where the player algorithm returns an invalid move"""
 
@@ -278,6 +327,293 @@ class InvalidTestCase(unittest.TestCase):
             game.tick()
 
 
+class ThreatIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.game = gobblet.Game(Mock(), Mock())
+        self.white = self.game.white.player
+        self.black = self.game.black.player
+
+    def place(self, info, key):
+        piece = info.dugout.available[0]
+        info.dugout.use_piece(piece)
+        self.game.board[key].push(piece)
+        self.game.threats.update(key)
+        return piece
+
+    def test_open_cells(self):
+        threats = self.game.threats
+        self.place(self.game.white, (0, 0))
+        self.place(self.game.white, (0, 1))
+        self.assertEqual(threats.open_cells(self.white), set())
+
+        self.place(self.game.white, (0, 2))
+        self.assertEqual(threats.open_cells(self.white), set([(0, 3)]))
+        self.assertEqual(threats.open_cells(self.black), set())
+
+        self.assertTrue(threats.in_three((0, 1), self.white))
+        self.assertFalse(threats.in_three((0, 1), self.black))
+        self.assertFalse(threats.in_three((1, 1), self.white))
+
+    def test_cover_updates_counts(self):
+        threats = self.game.threats
+        self.place(self.game.white, (0, 0))
+        self.place(self.game.white, (0, 1))
+        self.place(self.game.white, (0, 2))
+        self.place(self.game.white, (0, 3))
+        self.assertEqual(threats.winner(), self.white)
+
+        # Lift white's last piece and let black take the cell instead.
+        self.game.board[0, 3].pop()
+        threats.update((0, 3))
+        self.place(self.game.black, (0, 3))
+
+        self.assertEqual(threats.winner(), None)
+        self.assertEqual(threats.open_cells(self.white), set([(0, 3)]))
+
+    def test_rebuild(self):
+        board = self.game.board
+        for col in range(3):
+            piece = self.game.white.dugout.available[0]
+            self.game.white.dugout.use_piece(piece)
+            board[1, col].push(piece)
+
+        self.assertEqual(self.game.threats.open_cells(self.white), set())
+        self.game.threats.rebuild()
+        self.assertEqual(self.game.threats.open_cells(self.white),
+                         set([(1, 3)]))
+
+
+class GobbleRuleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.next_move = None
+
+        def alg(board, dugout):
+            return self.next_move(board, dugout)
+
+        self.game = gobblet.Game(alg, Mock())
+        self.black = self.game.black
+
+    def place_black(self, key, stack_i=0):
+        # Skip the extra large piece, so white can cover the one below it.
+        self.black.dugout.stacks[stack_i].pop()
+        piece = self.black.dugout.stacks[stack_i].pop()
+        self.game.board[key].push(piece)
+        self.game.threats.update(key)
+
+    def test_cannot_cover_from_dugout(self):
+        self.place_black((0, 0))
+        self.next_move = lambda b, d: (d.available[0], (0, 0))
+
+        regexp = 'Can only cover a piece from the dugout'
+        with self.assertRaisesRegexp(gobblet.InvalidMove, regexp):
+            self.game.tick()
+
+    def test_cover_three_in_a_row_from_dugout(self):
+        self.place_black((0, 0), 0)
+        self.place_black((0, 1), 1)
+        self.place_black((0, 2), 2)
+        self.next_move = lambda b, d: (d.available[0], (0, 1))
+
+        self.game.tick()
+
+        self.assertEqual(self.game.board[0, 1].top().player,
+                         self.game.white.player)
+        self.assertEqual(self.game.threats.open_cells(self.black.player),
+                         set())
+
+    def test_available_moves(self):
+        self.place_black((0, 0))
+        moves = self.game.available_moves()
+        dests = set(dest for piece, dest in moves)
+
+        # One dugout size, placed on any of the fifteen empty cells.
+        self.assertEqual(len(moves), 15)
+        self.assertNotIn((0, 0), dests)
+
+
+class MinimaxPlayerTestCase(unittest.TestCase):
+
+    def test_takes_win(self):
+        white = gobblet.MinimaxPlayer('white', depth=2)
+        game = gobblet.Game(white, Mock())
+
+        for col in range(3):
+            piece = game.white.dugout.available[0]
+            game.white.dugout.use_piece(piece)
+            game.board[2, col].push(piece)
+
+        piece, dest = white(game.board, game.white.dugout)
+        self.assertEqual(dest, (2, 3))
+
+    def test_blocks_loss(self):
+        white = gobblet.MinimaxPlayer('white', depth=2)
+        black = gobblet.Player('black')
+        game = gobblet.Game(white, black)
+
+        for row in range(3):
+            piece = game.black.dugout.available[0]
+            game.black.dugout.use_piece(piece)
+            game.board[row, 1].push(piece)
+
+        # White can block by taking the last cell, or by gobbling one of
+        # black's smaller pieces now that they make a three-in-a-row.
+        piece, dest = white(game.board, game.white.dugout)
+        self.assertIn(dest, [(1, 1), (2, 1), (3, 1)])
+
+    def test_apply_and_undo(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        piece = game.white.dugout.available[0]
+
+        token, winner = game._apply(piece, (1, 2))
+        self.assertEqual(winner, None)
+        self.assertIs(game.board[1, 2].top(), piece)
+        self.assertEqual(game.on_deck, game.black)
+
+        game._undo(token)
+        self.assertEqual(len(game.board[1, 2]), 0)
+        self.assertIs(game.white.dugout.available[0], piece)
+        self.assertEqual(game.on_deck, game.white)
+
+    def test_submit(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        piece, dest = game.find_move(gobblet.Move(3, None, (0, 0)))
+
+        self.assertEqual(game.submit(piece, dest), None)
+        self.assertIs(game.board[0, 0].top(), piece)
+        self.assertIs(game.on_deck, game.black)
+
+        # Black can't cover white's piece from the dugout.
+        piece, dest = game.find_move(gobblet.Move(3, None, (0, 0)))
+        with self.assertRaises(gobblet.InvalidMove):
+            game.submit(piece, dest)
+        self.assertEqual(game.find_move(gobblet.Move(3, (0, 0), (1, 1))),
+                         None)
+
+    def test_legal_move(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        piece, dest = game.legal_move(gobblet.Move(3, None, (0, 0)))
+        self.assertIs(piece, game.white.dugout.available[0])
+        game.submit(piece, dest)
+
+        # Black has nothing on the board, and can't cover from the dugout.
+        for move in [gobblet.Move(3, (1, 1), (2, 2)),
+                     gobblet.Move(3, None, (0, 0)),
+                     gobblet.Move(3, None, (4, 0))]:
+            with self.assertRaises(gobblet.Forfeit):
+                game.legal_move(move)
+
+    def test_table_matches_plain_search(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        game._apply(game.white.dugout.available[0], (1, 1))
+        game._apply(game.black.dugout.available[0], (2, 2))
+
+        cached = gobblet.MinimaxPlayer('cached')
+        plain = gobblet.MinimaxPlayer('plain', table_size=0)
+        for depth in range(1, 4):
+            self.assertEqual(cached.best_move(game, depth)[1],
+                             plain.best_move(game, depth)[1])
+        self.assertTrue(cached.table)
+
+    def test_think_stops_in_time(self):
+        player = gobblet.MinimaxPlayer('white')
+        game = gobblet.Game(player, gobblet.Player('black'))
+        before = [len(cell) for key, cell in game.board]
+
+        best, score, nodes, searched = player.think(game, time_limit=0.2)
+        self.assertIn(best, game.available_moves())
+        self.assertGreater(nodes, 0)
+        self.assertGreater(searched, 0)
+        # An interrupted search leaves the game as it found it.
+        self.assertEqual([len(cell) for key, cell in game.board], before)
+        self.assertIs(game.on_deck, game.white)
+
+    def _three_in_a_row(self, player):
+        # White has three in the top row, with (0, 3) open, and is on deck.
+        game = gobblet.Game(player, gobblet.Player('black'))
+        for white_dest, black_dest in [((0, 0), (3, 3)), ((0, 1), (3, 2)),
+                                       ((0, 2), (2, 0))]:
+            game._apply(game.white.dugout.available[0], white_dest)
+            game._apply(game.black.dugout.available[0], black_dest)
+        return game
+
+    def test_tactical_moves(self):
+        player = gobblet.MinimaxPlayer('white')
+        game = self._three_in_a_row(player)
+
+        moves = player.tactical_moves(game)
+        self.assertEqual(moves[0][1], (0, 3))
+        dests = set(dest for piece, dest in moves)
+        # Covering black's small piece is tactical, quiet moves aren't.
+        self.assertIn((2, 0), dests)
+        self.assertNotIn((2, 2), dests)
+        self.assertLess(len(moves), len(game.available_moves()))
+
+    def tactical_pieces(self, text):
+        player = gobblet.MinimaxPlayer('white')
+        game = notation.game_from_text(text, player, gobblet.Player('black'))
+        return game, [(piece, dest)
+                      for piece, dest in player.tactical_moves(game)
+                      if piece is game.board[0, 0].top()]
+
+    def test_uncover_making_three(self):
+        # White's extra large piece sits on its own small one, so moving it
+        # along the top row still leaves the small one in the row.
+        game, moves = self.tactical_pieces('(BD)C2/4/4/2dd 144 334 w abcd')
+        self.assertEqual(set(dest for piece, dest in moves),
+                         set([(0, 2), (0, 3)]))
+
+        # Without the small one, the move takes a piece out of the row.
+        game, moves = self.tactical_pieces('DC2/4/4/2dd 244 334 w abcd')
+        self.assertEqual(moves, [])
+
+    def test_no_moves_which_lose_at_once(self):
+        # Lifting white's piece off (0, 0) reveals black's top row.
+        game, moves = self.tactical_pieces('(cD)ddd/4/4/4 443 332 w abcd')
+        self.assertEqual(moves, [])
+        self.assertIn(game.board[0, 0].top(),
+                      [piece for piece, dest in game.available_moves()])
+
+    def test_quiescence_budget_is_per_search(self):
+        class CountingPlayer(gobblet.MinimaxPlayer):
+            tactical = 0
+
+            def quiesce(self, game, alpha, beta, depth):
+                if depth < self.QUIESCENCE_DEPTH:
+                    self.tactical += 1
+                return super(CountingPlayer, self).quiesce(game, alpha, beta,
+                                                           depth)
+
+        player = CountingPlayer('white', quiescence_nodes=10)
+        game = self._three_in_a_row(player)
+        game._apply(game.white.dugout.available[0], (2, 2))
+        player.best_move(game, 2)
+        self.assertGreater(player.tactical, 0)
+        self.assertLessEqual(player.tactical, 10)
+
+    def test_quiesce_finds_pending_win(self):
+        player = gobblet.MinimaxPlayer('white', quiescence_nodes=64)
+        game = self._three_in_a_row(player)
+
+        player._quiescence_left = player.quiescence_nodes
+        score = player.quiesce(game, -player.WIN, player.WIN,
+                               player.QUIESCENCE_DEPTH)
+        self.assertEqual(score, player.WIN)
+        self.assertLess(player.evaluate(game), player.WIN)
+
+    def test_quiescence_off_by_default(self):
+        game = gobblet.Game(gobblet.Player('white'), gobblet.Player('black'))
+        game._apply(game.white.dugout.available[0], (1, 1))
+        game._apply(game.black.dugout.available[0], (2, 2))
+
+        plain = gobblet.MinimaxPlayer('plain')
+        quiet = gobblet.MinimaxPlayer('quiet', quiescence_nodes=64)
+        plain.think(game, 1)
+        quiet.think(game, 1)
+        self.assertLess(plain.nodes, quiet.nodes)
+
+
 class SimulationTestCase(unittest.TestCase):
 
     def _init_simulation(self):
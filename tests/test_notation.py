@@ -0,0 +1,133 @@
+import random
+import unittest
+
+import gobblet
+from gobblet import Move, Position
+import notation
+
+
+class NotationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.white = gobblet.Player('white')
+        self.black = gobblet.Player('black')
+        self.game = gobblet.Game(self.white, self.black)
+        self.start = Position.initial(self.game.variant)
+
+    def random_positions(self, seed, plies=40):
+        rand = random.Random(seed)
+        position = self.start
+        for ply in range(plies):
+            moves = position.moves()
+            if not moves:
+                return
+            after = position.play(rand.choice(moves))
+            if after.winner is not None:
+                return
+            position = after
+            yield position
+
+    def test_start(self):
+        self.assertEqual(notation.to_text(self.start),
+                         '4/4/4/4 444 444 w abcd')
+        self.assertEqual(notation.from_text('4/4/4/4 444 444 w abcd'),
+                         self.start)
+
+    def test_stacks(self):
+        position = self.start.play(Move(3, None, (0, 0)))
+        position = position.play(Move(3, None, (1, 2)))
+        position = position.play(Move(2, None, (3, 3)))
+
+        text = notation.to_text(position)
+        self.assertEqual(text, 'D3/2d1/4/3C 442 443 b abcd')
+
+    def test_text_round_trip(self):
+        for seed in range(5):
+            for position in self.random_positions(seed):
+                text = notation.to_text(position)
+                self.assertEqual(notation.from_text(text), position)
+
+    def test_bytes_round_trip(self):
+        size = notation.record_size(self.game.variant)
+        self.assertEqual(size, 23)
+
+        for seed in range(5):
+            for position in self.random_positions(seed):
+                data = notation.to_bytes(position)
+                self.assertEqual(len(data), size)
+                self.assertEqual(
+                    notation.from_bytes(data, position.variant), position)
+
+    def test_variant(self):
+        game = gobblet.Game(self.white, self.black, board_size=3,
+                            sizes=gobblet.Sizes.all[1:], num_stacks=2)
+        text = notation.game_to_text(game)
+        self.assertEqual(text, '3/3/3 33 33 w bcd')
+        self.assertIs(notation.from_text(text).variant, game.variant)
+        self.assertEqual(notation.from_text('3/3/3 33 33 w dcb'),
+                         notation.from_text(text))
+
+    def test_game_round_trip(self):
+        text = '(aD)3/1bC1/4/2cd 442 440 b abcd'
+        game = notation.game_from_text(text, self.white, self.black)
+
+        self.assertIs(game.on_deck, game.black)
+        self.assertIs(game.board[0, 0].top().player, self.white)
+        self.assertEqual(len(game.board[0, 0]), 2)
+        self.assertEqual(notation.game_to_text(game), text)
+
+    def test_bad_text(self):
+        bad = [
+            '4/4/4/4 444 444 w',
+            '4/4/4/3 444 444 w abcd',
+            '4/4/4/4 444 44 w abcd',
+            '4/4/4/4 444 444 x abcd',
+            '(Da)3/4/4/4 444 444 w abcd',
+            '(D3/4/4/4 444 444 w abcd',
+            'e3/4/4/4 444 444 w abcd',
+            '4/4/4/4 444 444 wb abcd',
+            '4/4/4/4 454 444 w abcd',
+            'A2/3/3 3 3 w bcd',
+            'DDDD/4/4/4 333 444 b abcd',
+            'D3/4/4/4 444 444 b abcd',
+        ]
+        for text in bad:
+            with self.assertRaises(notation.NotationError):
+                notation.from_text(text)
+
+    def test_bad_bytes(self):
+        with self.assertRaises(notation.NotationError):
+            notation.from_bytes(b'\0' * 10, self.game.variant)
+
+        data = bytearray(notation.to_bytes(Position.from_game(self.game)))
+        for i, byte in [(-1, 2), (-2, 5), (0, 0xff), (0, 0x01)]:
+            bad = bytearray(data)
+            bad[i] = byte
+            with self.assertRaises(notation.NotationError):
+                notation.from_bytes(bytes(bad), self.game.variant)
+
+        # An extra small piece, in a variant without them.
+        variant = gobblet.Variant.get(3, gobblet.Sizes.all[1:], 2)
+        bad = bytearray(notation.to_bytes(Position.initial(variant)))
+        bad[0] = 0x01
+        with self.assertRaises(notation.NotationError):
+            notation.from_bytes(bytes(bad), variant)
+
+    def test_moves(self):
+        self.assertEqual(notation.move_to_text(Move(3, None, (2, 1))), 'D@b3')
+        self.assertEqual(notation.move_to_text(Move(2, (0, 0), (3, 3))),
+                         'a1-d4')
+
+        position = notation.from_text('D3/4/4/4 443 444 w abcd')
+        for move in [Move(2, None, (1, 2)), Move(3, (0, 0), (0, 1))]:
+            text = notation.move_to_text(move)
+            self.assertEqual(notation.move_from_text(text, position), move)
+
+    def test_bad_moves(self):
+        for text in ['D@z9', 'D@a0', 'E@a1', 'a1-b2', 'a1b2']:
+            with self.assertRaises(notation.NotationError):
+                notation.move_from_text(text, self.start)
+
+
+if __name__ == '__main__':
+    unittest.main()
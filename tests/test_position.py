@@ -0,0 +1,100 @@
+import unittest
+
+import gobblet
+from gobblet import Move, Position
+
+
+class PositionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.white = gobblet.Player('white')
+        self.black = gobblet.Player('black')
+        self.game = gobblet.Game(self.white, self.black)
+        self.start = Position.initial(self.game.variant)
+
+    def play(self, piece, dest):
+        # Play the same move in the game, and return it as a Move.
+        move = Move(piece.size.value, self.game.board.find(piece), dest)
+        self.game._apply(piece, dest)
+        return move
+
+    def test_initial(self):
+        self.assertEqual(self.start, Position.from_game(self.game))
+        self.assertEqual(self.start.dugouts, ((4, 4, 4), (4, 4, 4)))
+        self.assertEqual(self.start.to_move, 0)
+
+    def test_play_matches_game(self):
+        position = self.start
+        position = position.play(
+            self.play(self.game.white.dugout.available[0], (0, 0)))
+        position = position.play(
+            self.play(self.game.black.dugout.available[0], (1, 1)))
+        position = position.play(
+            self.play(self.game.board[0, 0].top(), (2, 2)))
+
+        self.assertEqual(position, Position.from_game(self.game))
+        self.assertEqual(position[2, 2], ((0, 3),))
+        self.assertEqual(position.dugouts, ((4, 4, 3), (4, 4, 3)))
+        self.assertEqual(position.to_move, 1)
+
+    def test_play_does_not_change_position(self):
+        after = self.start.play(Move(3, None, (0, 0)))
+
+        self.assertEqual(self.start[0, 0], ())
+        self.assertEqual(self.start.to_move, 0)
+        self.assertNotEqual(self.start, after)
+
+    def test_untouched_rows_are_shared(self):
+        after = self.start.play(Move(3, None, (1, 2)))
+
+        self.assertIsNot(after.rows[1], self.start.rows[1])
+        for row in (0, 2, 3):
+            self.assertIs(after.rows[row], self.start.rows[row])
+        # The white player's dugout changed, black's didn't.
+        self.assertIs(after.dugouts[1], self.start.dugouts[1])
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.start.to_move = 1
+
+    def test_hashable(self):
+        a = self.start.play(Move(3, None, (0, 0))).play(Move(3, None, (3, 3)))
+        b = self.start.play(Move(3, None, (0, 0))).play(Move(3, None, (3, 3)))
+        # The same cells, with the colors swapped.
+        c = self.start.play(Move(3, None, (3, 3))).play(Move(3, None, (0, 0)))
+
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, c)
+        self.assertEqual(len(set([a, b, c])), 2)
+
+    def test_moves_match_game(self):
+        position = self.start.play(Move(3, None, (0, 0)))
+        self.game._apply(self.game.white.dugout.available[0], (0, 0))
+
+        self.assertEqual(len(position.moves()),
+                         len(self.game.available_moves()))
+
+    def test_winner(self):
+        position = self.start
+        for col in range(3):
+            position = position.play(Move(3 - col, None, (0, col)))
+            position = position.play(Move(3 - col, None, (3, col)))
+
+        self.assertEqual(position.winner, None)
+        position = position.play(Move(0, None, (0, 3)))
+        self.assertEqual(position.winner, 0)
+        self.assertEqual(position.moves(), [])
+
+    def test_to_game(self):
+        position = self.start.play(Move(3, None, (0, 0)))
+        position = position.play(Move(3, None, (0, 1)))
+
+        game = position.to_game(self.white, self.black)
+        self.assertEqual(Position.from_game(game), position)
+        self.assertIs(game.on_deck, game.white)
+        self.assertIs(game.board[0, 1].top().player, self.black)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import time
+import unittest
+
+import gobblet
+from gobblet import MinimaxPlayer, Player
+import sandbox
+
+
+class CheatingPlayer(Player):
+
+    # Empties the board it's given, and the opponent's pieces with it.
+    def move(self, board, dugout):
+        dest = [key for key, cell in board if not cell][0]
+        for key, cell in board:
+            del cell.pieces[:]
+        return dugout.available[0], dest
+
+
+class SpinningPlayer(Player):
+
+    def move(self, board, dugout):
+        while True:
+            pass
+
+
+class SleepingPlayer(Player):
+
+    def move(self, board, dugout):
+        time.sleep(10)
+
+
+class OffBoardPlayer(Player):
+
+    def move(self, board, dugout):
+        return dugout.available[0], (9, 9)
+
+
+class CrashingPlayer(Player):
+
+    def move(self, board, dugout):
+        raise ValueError('oops')
+
+
+class SandboxedPlayerTestCase(unittest.TestCase):
+
+    def sandboxed(self, player, **kwargs):
+        sandboxed = sandbox.SandboxedPlayer(player, **kwargs)
+        self.addCleanup(sandboxed.stop)
+        return sandboxed
+
+    def test_plays_a_game(self):
+        white = self.sandboxed(MinimaxPlayer('white', depth=1))
+        black = self.sandboxed(MinimaxPlayer('black', depth=1))
+        game = gobblet.Game(white, black)
+
+        for ply in range(60):
+            winner = game.tick()
+            if winner is not None:
+                break
+        self.assertIn(winner, (white, black))
+
+    def test_worker_keeps_its_state(self):
+        white = self.sandboxed(MinimaxPlayer('white', depth=1))
+        game = gobblet.Game(white, Player('black'))
+
+        game.move(game.white.player, game.white.dugout)
+        pid = white.process.pid
+        game.on_deck, game.off_deck = game.white, game.black
+        game.move(game.white.player, game.white.dugout)
+        self.assertEqual(white.process.pid, pid)
+
+    def test_cannot_change_the_game(self):
+        black = self.sandboxed(CheatingPlayer('black'))
+        game = gobblet.Game(MinimaxPlayer('white', depth=1), black)
+        game.tick()
+        before = [list(cell.pieces) for key, cell in game.board]
+
+        # Black's move is played, on the real board.
+        self.assertEqual(game.tick(), None)
+        after = [list(cell.pieces) for key, cell in game.board]
+        self.assertEqual(sum(map(len, after)), 2)
+        for old, new in zip(before, after):
+            for piece in old:
+                self.assertIn(piece, new)
+
+    def test_cpu_limit(self):
+        white = self.sandboxed(SpinningPlayer('white'), cpu_limit=0.2,
+                               wall_limit=5)
+        game = gobblet.Game(white, Player('black'))
+
+        start = time.time()
+        self.assertEqual(game.tick(), game.black.player)
+        self.assertLess(time.time() - start, 2)
+        self.assertEqual(white.process, None)
+
+    def test_wall_limit(self):
+        white = self.sandboxed(SleepingPlayer('white'), cpu_limit=0.2)
+        game = gobblet.Game(white, Player('black'))
+        self.assertEqual(game.tick(), game.black.player)
+
+    def test_crash_forfeits(self):
+        white = self.sandboxed(CrashingPlayer('white'))
+        game = gobblet.Game(white, Player('black'))
+        self.assertEqual(game.tick(), game.black.player)
+
+    def test_illegal_move_forfeits(self):
+        white = self.sandboxed(OffBoardPlayer('white'))
+        game = gobblet.Game(white, Player('black'))
+        self.assertEqual(game.tick(), game.black.player)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from gobblet import MinimaxPlayer
+import server
+
+
+class GameServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.server = server.GameServer(('127.0.0.1', 0), move_time=5)
+        self.address = self.server.listen()
+        self.running = True
+
+        def run():
+            while self.running:
+                self.server.serve_once(0.05)
+        self.thread = threading.Thread(target=run)
+        self.thread.start()
+
+    def tearDown(self):
+        self.running = False
+        self.thread.join()
+        self.server.close()
+
+    def connect(self, name):
+        sock = socket.create_connection(self.address)
+        f = sock.makefile('rwb')
+        sock.close()
+        self.addCleanup(f.close)
+        self.send(f, 'HELLO ' + name)
+        return f
+
+    def send(self, f, line):
+        f.write(line.encode('ascii') + b'\n')
+        f.flush()
+
+    def read(self, f):
+        return f.readline().decode('ascii').strip()
+
+    def play(self, players):
+        results = {}
+
+        def run(player):
+            results[player.name] = server.play_remote(self.address, player)
+
+        threads = [threading.Thread(target=run, args=(player,))
+                   for player in players]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_many_games(self):
+        players = [MinimaxPlayer('player{}'.format(i), depth=1)
+                   for i in range(20)]
+        results = self.play(players)
+
+        self.assertEqual(len(self.server.results), 10)
+        self.assertEqual(self.server.matches, set())
+        for result in self.server.results:
+            self.assertIn(result.reason, ('line', 'plies'))
+            if result.winner is not None:
+                loser = (result.black if result.winner == result.white
+                         else result.white)
+                self.assertEqual(results[result.winner], ('win', 'line'))
+                self.assertEqual(results[loser], ('loss', 'line'))
+
+    def test_protocol(self):
+        white = self.connect('alice')
+        black = self.connect('bob')
+
+        self.assertEqual(self.read(white), 'START w bob')
+        self.assertEqual(self.read(black), 'START b alice')
+        self.assertEqual(self.read(white), 'TURN 4/4/4/4 444 444 w abcd 5')
+
+        self.send(white, 'D@a1')
+        self.assertEqual(self.read(black), 'TURN D3/4/4/4 443 444 b abcd 5')
+
+        # Black can't cover white's piece from the dugout.
+        self.send(black, 'D@a1')
+        self.assertTrue(self.read(black).startswith('ERROR'))
+        self.assertEqual(self.read(black), 'END loss invalid')
+        self.assertEqual(self.read(white), 'END win invalid')
+
+        result, = self.server.results
+        self.assertEqual(result.winner, 'alice')
+        self.assertEqual(result.plies, 1)
+
+    def test_timeout(self):
+        self.server.move_time = 0.2
+        white = self.connect('slow')
+        black = self.connect('fast')
+
+        self.read(white)
+        self.read(black)
+        self.read(white)
+        self.assertEqual(self.read(white), 'END loss timeout')
+        self.assertEqual(self.read(black), 'END win timeout')
+
+    def test_disconnect(self):
+        white = self.connect('quitter')
+        black = self.connect('stayer')
+        self.read(black)
+
+        white.close()
+        self.assertEqual(self.read(black), 'END win disconnect')
+
+    def test_hello_first(self):
+        sock = socket.create_connection(self.address)
+        f = sock.makefile('rwb')
+        self.addCleanup(f.close)
+        self.send(f, 'D@a1')
+        self.assertTrue(self.read(f).startswith('ERROR'))
+
+
+class BackpressureTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        path = os.path.join(self.dir, 'gobblet.sock')
+        self.server = server.GameServer(path, max_connections=2)
+        self.address = self.server.listen()
+
+    def tearDown(self):
+        self.server.close()
+        shutil.rmtree(self.dir)
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.address)
+        self.addCleanup(sock.close)
+        return sock
+
+    def test_stops_accepting_when_full(self):
+        for i in range(3):
+            self.connect()
+        for i in range(5):
+            self.server.serve_once(0.01)
+        self.assertEqual(len(self.server.connections), 2)
+
+        # Once a connection goes, the waiting one is accepted.
+        list(self.server.connections.values())[0].close()
+        for i in range(5):
+            self.server.serve_once(0.01)
+        self.assertEqual(len(self.server.connections), 2)
+
+    def test_stops_reading_from_slow_readers(self):
+        sock = self.connect()
+        self.server.serve_once(0.01)
+        connection, = self.server.connections.values()
+
+        connection.send_line('x' * (self.server.max_outbox // 2))
+        self.assertFalse(connection.closed)
+        connection.send_line('x' * self.server.max_outbox)
+        self.assertTrue(connection.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import gobblet
+import tablebase
+
+
+def tic_tac_toe(white, black):
+    # Three in a row on a 3x3 board, with three pieces each which can't
+    # cover one another. Small enough to solve in a moment.
+    return gobblet.Game(white, black, board_size=3,
+                        sizes=[gobblet.Sizes.xl], num_stacks=3)
+
+
+def jr(white, black):
+    return gobblet.Game(white, black, board_size=3,
+                        sizes=gobblet.Sizes.all[-2:], num_stacks=2)
+
+
+class PositionCoderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.white = gobblet.Player('white')
+        self.black = gobblet.Player('black')
+
+    def test_round_trip(self):
+        game = jr(self.white, self.black)
+        game._apply(game.white.dugout.available[0], (0, 1))
+        game._apply(game.black.dugout.available[0], (1, 1))
+
+        coder = tablebase.PositionCoder(game.variant)
+        code = coder.encode(game)
+        decoded = coder.decode(code)
+
+        self.assertIs(decoded.variant, game.variant)
+        self.assertEqual(coder.encode(decoded), code)
+        self.assertEqual(len(decoded.on_deck.dugout.available), 2)
+        self.assertEqual(len(decoded.off_deck.dugout.available), 2)
+
+    def test_symmetric_positions_match(self):
+        a = jr(self.white, self.black)
+        a._apply(a.white.dugout.available[0], (0, 1))
+
+        b = jr(self.white, self.black)
+        b._apply(b.white.dugout.available[0], (1, 2))
+
+        coder = tablebase.PositionCoder(a.variant)
+        self.assertEqual(coder.encode(a), coder.encode(b))
+
+
+class SolveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tic_tac_toe(gobblet.Player('white'),
+                                gobblet.Player('black'))
+        self.table = tablebase.solve(self.root)
+        self.coder = tablebase.PositionCoder(self.root.variant)
+
+    def test_start_is_a_draw(self):
+        code = self.coder.encode(self.root)
+        self.assertEqual(self.table[code], (tablebase.DRAW, 0))
+
+    def test_results_agree_with_search(self):
+        searcher = gobblet.MinimaxPlayer('searcher')
+
+        for code, (result, distance) in sorted(self.table.items())[:50]:
+            if result == tablebase.DRAW:
+                continue
+
+            game = self.coder.decode(code)
+            move, score = searcher.best_move(game, distance)
+            if result == tablebase.WIN:
+                self.assertTrue(score >= searcher.WIN)
+            else:
+                self.assertTrue(score <= -searcher.WIN)
+
+    def test_max_positions(self):
+        with self.assertRaises(tablebase.TablebaseError):
+            tablebase.solve(self.root, max_positions=10)
+
+
+class TablebaseFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'tictactoe.tb')
+        self.root = tic_tac_toe(gobblet.Player('white'),
+                                gobblet.Player('black'))
+        self.table = tablebase.build_tablebase(self.path, self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_lookup(self):
+        with tablebase.Tablebase(self.path) as table:
+            self.assertEqual(len(table), len(self.table))
+            for code, found in self.table.items():
+                self.assertEqual(table.find(code), found)
+
+    def test_probe(self):
+        with tablebase.Tablebase(self.path) as table:
+            self.assertEqual(table.probe(self.root), (tablebase.DRAW, 0))
+
+            # Not the same configuration, so not in this table.
+            game = gobblet.Game(gobblet.Player('white'),
+                                gobblet.Player('black'))
+            self.assertEqual(table.probe(game), None)
+
+    def test_player_uses_tablebase(self):
+        with tablebase.Tablebase(self.path) as table:
+            player = gobblet.MinimaxPlayer('white', depth=4, tablebase=table)
+            game = tic_tac_toe(player, gobblet.Player('black'))
+
+            move = player(game.board, game.white.dugout)
+            self.assertIn(move, game.available_moves())
+            # Every reply is in the table, so nothing is searched past it.
+            self.assertEqual(player.nodes, len(game.available_moves()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import random
+import unittest
+
+import gobblet
+from gobblet import MinimaxPlayer, Player
+import tournament
+
+
+class Forfeiter(Player):
+
+    def move(self, board, dugout):
+        raise gobblet.Forfeit()
+
+
+class StatsTestCase(unittest.TestCase):
+
+    def test_elo_and_score(self):
+        self.assertAlmostEqual(tournament.expected_score(0), 0.5)
+        self.assertAlmostEqual(tournament.elo_from_score(0.75), 190.85, 2)
+        self.assertAlmostEqual(
+            tournament.elo_from_score(tournament.expected_score(123)), 123)
+
+    def test_z_score(self):
+        self.assertAlmostEqual(tournament.z_score(0.95), 1.96, 2)
+
+    def test_interval(self):
+        elo, low, high = tournament.elo_interval(60, 20, 20)
+        self.assertGreater(elo, 0)
+        self.assertLess(low, elo)
+        self.assertGreater(high, elo)
+
+        # More games, narrower interval.
+        elo, wider_low, wider_high = tournament.elo_interval(6, 2, 2)
+        self.assertLess(high - low, wider_high - wider_low)
+
+    def test_sprt(self):
+        sprt = tournament.SPRT(elo0=0, elo1=50)
+        self.assertEqual(sprt.status(1, 0, 1), None)
+        self.assertEqual(sprt.status(200, 0, 0), tournament.H1)
+        self.assertEqual(sprt.status(0, 0, 200), tournament.H0)
+        self.assertEqual(sprt.status(500, 0, 500), tournament.H0)
+        self.assertGreater(sprt.llr(60, 20, 20), sprt.llr(50, 20, 30))
+
+
+class TournamentTestCase(unittest.TestCase):
+
+    def test_play_game(self):
+        strong = MinimaxPlayer('strong', depth=1)
+        weak = Forfeiter('weak')
+        self.assertEqual(tournament.play_game(strong, weak), 1)
+        self.assertEqual(tournament.play_game(weak, strong), 0)
+        self.assertEqual(tournament.play_game(
+            MinimaxPlayer('a', depth=1), MinimaxPlayer('b', depth=1),
+            max_turns=2), 0.5)
+
+    def test_opening(self):
+        opening = tournament.random_opening(4, random.Random(1))
+        self.assertEqual(len(opening), 4)
+        a = MinimaxPlayer('a', depth=1)
+        b = MinimaxPlayer('b', depth=1)
+        tournament.play_game(a, b, opening=opening)
+
+    def test_stops_when_decided(self):
+        strong = MinimaxPlayer('strong', depth=1)
+        weak = Forfeiter('weak')
+        event = tournament.Tournament([strong, weak], seed=1)
+        ratings = event.run()
+
+        pairing, = event.pairings
+        self.assertEqual(pairing.status, tournament.H1)
+        self.assertEqual(pairing.losses, 0)
+        self.assertLess(event.games, 50)
+        self.assertIs(ratings[0].player, strong)
+        self.assertLess(ratings[0].low, ratings[0].elo)
+        self.assertGreater(ratings[0].high, ratings[0].elo)
+
+    def test_most_uncertain_first(self):
+        players = [Forfeiter('a'), Forfeiter('b'), Forfeiter('c')]
+        event = tournament.Tournament(players, max_games=6, seed=1)
+        event.run()
+
+        # Each pairing has been played once before any is played again.
+        self.assertEqual([pairing.games for pairing in event.pairings],
+                         [2, 2, 2])
+
+    def test_ratings_centred(self):
+        players = [MinimaxPlayer('depth1', depth=1), Forfeiter('forfeiter'),
+                   Forfeiter('other')]
+        event = tournament.Tournament(players, max_games=12, seed=1)
+        ratings = event.run()
+
+        self.assertAlmostEqual(sum(rating.elo for rating in ratings), 0)
+        self.assertEqual(ratings[0].player.name, 'depth1')
+
+
+if __name__ == '__main__':
+    unittest.main()
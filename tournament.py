@@ -0,0 +1,336 @@
+"""
+Tournaments between player algorithms, which stop as soon as the results
+are clear rather than after a fixed number of games.
+
+Each pair of players plays games two at a time, one with each player as
+white, from the same opening. After each pair of games, a sequential
+probability ratio test (SPRT) decides whether the first player is
+stronger than the second by at least elo1, or by no more than elo0, or
+whether more games are needed. The next games go to the undecided pair
+whose strength is least certain, so no games are spent on pairs which
+are already settled.
+
+Ratings for the whole pool come from fitting a Bradley-Terry model to
+every result, with confidence intervals.
+
+    python -m tournament --depths 1 2 3 --max-games 400
+"""
+import argparse
+from collections import namedtuple
+import itertools
+import math
+import random
+
+from gobblet import Game, InvalidMove, MinimaxPlayer, Position, Variant
+
+
+# SPRT decisions: H1 means the first player of the pair is stronger by
+# at least elo1, H0 that it's stronger by no more than elo0.
+H0, H1 = 'H0', 'H1'
+
+Rating = namedtuple('Rating', 'player elo low high games')
+
+
+def expected_score(elo):
+    """The expected score of a player rated elo points above its opponent."""
+    return 1 / (1 + 10 ** (-elo / 400.0))
+
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def z_score(confidence):
+    """The z for a two-sided normal confidence interval, e.g. 1.96 for 0.95."""
+    lo, hi = 0.0, 10.0
+    while hi - lo > 1e-9:
+        mid = (lo + hi) / 2
+        if math.erf(mid / math.sqrt(2)) < confidence:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def score_stats(wins, draws, losses):
+    """
+    Return the mean and the variance of the score of one game.
+
+    Half a game of each result is added, so that a perfect record still
+    has some variance, and one game is enough to start with.
+    """
+    wins, draws, losses = wins + 0.5, draws + 0.5, losses + 0.5
+    games = wins + draws + losses
+    mean = (wins + draws / 2) / games
+    variance = (wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 +
+                losses * mean ** 2) / games
+    return mean, variance
+
+
+def elo_interval(wins, draws, losses, confidence=0.95):
+    """Return the Elo difference shown by the results, and its bounds."""
+    games = wins + draws + losses
+    mean, variance = score_stats(wins, draws, losses)
+    if not games:
+        return 0.0, float('-inf'), float('inf')
+
+    margin = z_score(confidence) * math.sqrt(variance / games)
+    return (elo_from_score(mean), elo_from_score(mean - margin),
+            elo_from_score(mean + margin))
+
+
+class SPRT(object):
+
+    """
+    A sequential probability ratio test, with the normal approximation
+    to the log-likelihood ratio, as used for testing chess engines.
+
+    alpha is the chance of accepting H1 when H0 is true, and beta the
+    chance of accepting H0 when H1 is true.
+    """
+
+    def __init__(self, elo0=0, elo1=50, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    def llr(self, wins, draws, losses):
+        games = wins + draws + losses
+        if not games:
+            return 0.0
+
+        mean, variance = score_stats(wins, draws, losses)
+        s0 = expected_score(self.elo0)
+        s1 = expected_score(self.elo1)
+        return games * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    def status(self, wins, draws, losses):
+        """Return H0 or H1 once the test is decided, or else None."""
+        llr = self.llr(wins, draws, losses)
+        if llr >= self.upper:
+            return H1
+        elif llr <= self.lower:
+            return H0
+
+
+class Pairing(object):
+
+    """The results so far between two players, from a's point of view."""
+
+    def __init__(self, a, b):
+        self.a = a
+        self.b = b
+        self.wins = self.draws = self.losses = 0
+        self.status = None
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, score):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def interval(self, confidence=0.95):
+        return elo_interval(self.wins, self.draws, self.losses, confidence)
+
+    def uncertainty(self):
+        elo, low, high = self.interval()
+        return high - low
+
+
+def play_game(white, black, max_turns=200, opening=()):
+    """
+    Play a game and return white's score: 1 for a win, 0.5 for a draw and
+    0 for a loss. opening is a list of Moves to start from. A player who
+    makes an invalid move loses.
+    """
+    game = Game(white, black)
+    for move in opening:
+        piece, dest = game.find_move(move)
+        winner = game.submit(piece, dest)
+        if winner is not None:
+            return 1 if winner is white else 0
+
+    try:
+        winner = game.play(max_turns)
+    except InvalidMove:
+        winner = game.off_deck.player
+
+    if winner is None:
+        return 0.5
+    return 1 if winner is white else 0
+
+
+def random_opening(plies, rand):
+    """Return a list of plies random Moves from the start of a game."""
+    position = Position.initial(
+        Variant.get(Game.BOARD_SIZE, Game.SIZES, Game.NUM_STACKS))
+    moves = []
+    for ply in range(plies):
+        choices = [move for move in position.moves()
+                   if position.play(move).winner is None]
+        if not choices:
+            break
+        move = rand.choice(choices)
+        moves.append(move)
+        position = position.play(move)
+    return moves
+
+
+class Tournament(object):
+
+    """
+    Plays games between every pair of players, each pair until its SPRT
+    is decided or it has played max_games_per_pair games, or until the
+    tournament has played max_games in all.
+
+    Each pair of games starts with opening_plies random moves, to vary
+    the games between players which always play the same way. on_game is
+    called with the pairing after each pair of games.
+    """
+
+    def __init__(self, players, sprt=None, max_turns=200,
+                 max_games_per_pair=1000, max_games=None, opening_plies=2,
+                 seed=None, on_game=None):
+        self.players = list(players)
+        self.sprt = sprt or SPRT()
+        self.max_turns = max_turns
+        self.max_games_per_pair = max_games_per_pair
+        self.max_games = max_games
+        self.opening_plies = opening_plies
+        self.on_game = on_game
+        self._random = random.Random(seed)
+
+        self.pairings = [Pairing(a, b)
+                         for a, b in itertools.combinations(self.players, 2)]
+        self.games = 0
+
+    def undecided(self):
+        return [pairing for pairing in self.pairings
+                if pairing.status is None and
+                pairing.games < self.max_games_per_pair]
+
+    def next_pairing(self):
+        """The undecided pairing whose Elo difference is least certain."""
+        undecided = self.undecided()
+        if undecided:
+            return max(undecided, key=Pairing.uncertainty)
+
+    def play_pair(self, pairing):
+        opening = random_opening(self.opening_plies, self._random)
+        pairing.add(play_game(pairing.a, pairing.b, self.max_turns, opening))
+        pairing.add(1 - play_game(pairing.b, pairing.a, self.max_turns,
+                                  opening))
+        self.games += 2
+
+        pairing.status = self.sprt.status(pairing.wins, pairing.draws,
+                                          pairing.losses)
+        if self.on_game is not None:
+            self.on_game(pairing)
+
+    def run(self):
+        """Play until every pairing is decided, and return the ratings."""
+        while self.max_games is None or self.games < self.max_games:
+            pairing = self.next_pairing()
+            if pairing is None:
+                break
+            self.play_pair(pairing)
+        return self.ratings()
+
+    def ratings(self, confidence=0.95, iterations=1000):
+        """
+        Fit Elo ratings to every result so far, centred on 0, and return
+        a Rating for each player, best first.
+
+        Every pair which has played also gets one drawn game added, so
+        that players who have won or lost everything still have a finite
+        rating.
+        """
+        index = dict((id(player), i) for i, player in enumerate(self.players))
+        count = len(self.players)
+        points = [0.0] * count
+        games = [[0.0] * count for _ in range(count)]
+
+        for pairing in self.pairings:
+            if not pairing.games:
+                continue
+            a, b = index[id(pairing.a)], index[id(pairing.b)]
+            points[a] += pairing.wins + pairing.draws / 2.0 + 0.5
+            points[b] += pairing.losses + pairing.draws / 2.0 + 0.5
+            games[a][b] = games[b][a] = pairing.games + 1
+
+        # Bradley-Terry strengths, by minorization-maximization.
+        strengths = [1.0] * count
+        for iteration in range(iterations):
+            new = []
+            for i in range(count):
+                total = sum(games[i][j] / (strengths[i] + strengths[j])
+                            for j in range(count) if games[i][j])
+                new.append(points[i] / total if total else strengths[i])
+
+            # Keep the geometric mean at 1, so ratings centre on 0.
+            mean = math.exp(sum(math.log(s) for s in new) / count)
+            new = [s / mean for s in new]
+            done = max(abs(x - y) for x, y in zip(new, strengths)) < 1e-9
+            strengths = new
+            if done:
+                break
+
+        z = z_score(confidence)
+        scale = 400 / math.log(10)
+        ratings = []
+        for i, player in enumerate(self.players):
+            information = 0.0
+            for j in range(count):
+                if games[i][j]:
+                    p = strengths[i] / (strengths[i] + strengths[j])
+                    information += games[i][j] * p * (1 - p)
+
+            elo = scale * math.log(strengths[i])
+            margin = (scale * z / math.sqrt(information) if information
+                      else float('inf'))
+            played = sum(pairing.games for pairing in self.pairings
+                         if pairing.a is player or pairing.b is player)
+            ratings.append(Rating(player, elo, elo - margin, elo + margin,
+                                  played))
+
+        ratings.sort(key=lambda rating: rating.elo, reverse=True)
+        return ratings
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Rate MinimaxPlayers of different depths')
+    parser.add_argument('--depths', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--elo0', type=float, default=0)
+    parser.add_argument('--elo1', type=float, default=50)
+    parser.add_argument('--max-games', type=int, default=None)
+    parser.add_argument('--max-turns', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=None)
+
+    args = parser.parse_args()
+    players = [MinimaxPlayer('depth{}'.format(depth), depth=depth)
+               for depth in args.depths]
+
+    def report(pairing):
+        elo, low, high = pairing.interval()
+        print('{} v {}: +{} ={} -{}, {:+.0f} ({:+.0f} to {:+.0f}){}'.format(
+            pairing.a.name, pairing.b.name, pairing.wins, pairing.draws,
+            pairing.losses, elo, low, high,
+            ', ' + pairing.status if pairing.status else ''))
+
+    tournament = Tournament(players, SPRT(args.elo0, args.elo1),
+                            max_turns=args.max_turns,
+                            max_games=args.max_games, seed=args.seed,
+                            on_game=report)
+    for rating in tournament.run():
+        print('{:<10} {:+6.0f} ({:+.0f} to {:+.0f}), {} games'.format(
+            rating.player.name, rating.elo, rating.low, rating.high,
+            rating.games))